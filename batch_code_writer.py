@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from typing import Dict, Any, List, Literal
+from langgraph.types import Command
+
+import json_utils
+from claude_api import call_claude, acall_claude, call_claude_batch
+from code_writer import CodeWriterNode
+from file_deduplication import FileDedupTracker
+from state import GodotState
+from config import PROMPTS, MAX_CONCURRENT_CLAUDE_CALLS, DRAFT_STRATEGY, DRAFT_FILES_PER_REQUEST, DRAFT_MULTI_FILE_MAX_TOKENS
+
+logger = logging.getLogger(__name__)
+
+class BatchCodeWriterNode(CodeWriterNode):
+    """
+    Drafts the first iteration of every pending file up front, several files per request
+    when strategy is "multi_file", or as one Message Batches request when strategy is
+    "message_batches". The file processor only routes here for those two strategies; with
+    "concurrent" each file_pipeline branch drafts its own file.
+    The per-file writer/review loop then picks up the finished drafts instead of
+    waiting on one Claude round-trip per file.
+    """
+    def __init__(self, name: str, max_concurrency: int = MAX_CONCURRENT_CLAUDE_CALLS, strategy: str = DRAFT_STRATEGY):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.strategy = strategy
+        logger.info(f"BatchCodeWriterNode initialized: {name} with max {max_concurrency} concurrent call(s), strategy {strategy}")
+
+    async def __call__(self, state: GodotState):
+        """Make node callable for LangGraph"""
+        return await self.ainvoke(state)
+
+    def invoke(self, state: GodotState) -> Command[Literal["file_processor"]]:
+        instructions = state.get("instructions", {})
+        files = self._files_to_draft(state)
+        if self.strategy == "message_batches":
+            return Command(goto="file_processor", update={"drafts": self._draft_with_batch(instructions, files)})
+
+        drafts = {}
+        for group in self._multi_file_groups(files):
+            system, user = self._build_multi_file_prompt(instructions, group)
+            response = call_claude(user, max_tokens=self._multi_file_max_tokens(group), system=system)
+            drafts.update(self._drafts_from_multi_file_response(group, response))
+        return Command(goto="file_processor", update={"drafts": drafts})
+
+    async def ainvoke(self, state: GodotState) -> Command[Literal["file_processor"]]:
+        instructions = state.get("instructions", {})
+        files = self._files_to_draft(state)
+        if self.strategy == "message_batches":
+            drafts = await asyncio.to_thread(self._draft_with_batch, instructions, files)
+            return Command(goto="file_processor", update={"drafts": drafts})
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def draft_group(group: List[Dict[str, Any]]) -> Dict[str, str]:
+            system, user = self._build_multi_file_prompt(instructions, group)
+            async with semaphore:
+                response = await acall_claude(user, max_tokens=self._multi_file_max_tokens(group), system=system)
+            return self._drafts_from_multi_file_response(group, response)
+
+        groups = self._multi_file_groups(files)
+        logger.info(f"Drafting {len(files)} files in {len(groups)} multi-file request(s)")
+        drafts = {}
+        for group_drafts in await asyncio.gather(*(draft_group(group) for group in groups)):
+            drafts.update(group_drafts)
+        return Command(goto="file_processor", update={"drafts": drafts})
+
+    def _draft_with_batch(self, instructions: Dict[str, Any], files: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Draft all files through a single Message Batches request (they share one system prompt)."""
+        if not files:
+            return {}
+
+        system = self._build_system_prompt(instructions)
+        prompts = [
+            self._build_initial_prompt(instructions, f["filename"], f.get("purpose", ""), f.get("details", {}))[1]
+            for f in files
+        ]
+        logger.info(f"Drafting {len(files)} files in one message batch")
+        # One budget for the whole batch: the largest any of its files needs
+        max_tokens = max(self._max_tokens_for(f) for f in files)
+        responses = call_claude_batch(prompts, max_tokens=max_tokens, system=system)
+        return {f["filename"]: self._draft_from_response(f["filename"], response) for f, response in zip(files, responses)}
+
+    def _multi_file_groups(self, files: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        return [files[i:i + DRAFT_FILES_PER_REQUEST] for i in range(0, len(files), DRAFT_FILES_PER_REQUEST)]
+
+    def _multi_file_max_tokens(self, group: List[Dict[str, Any]]) -> int:
+        """A multi-file request needs room for every file it drafts, up to DRAFT_MULTI_FILE_MAX_TOKENS."""
+        return min(sum(self._max_tokens_for(f) for f in group), DRAFT_MULTI_FILE_MAX_TOKENS)
+
+    def _build_multi_file_prompt(self, instructions: Dict[str, Any], group: List[Dict[str, Any]]):
+        """One (system, user) prompt asking for all files of a group as a JSON array of {filename, code}."""
+        files = "".join(
+            PROMPTS["code_writer_multi_file"].format(
+                filename=f["filename"],
+                purpose=f.get("purpose", ""),
+                details_section=self._details_section(f.get("details", {}))
+            )
+            for f in group
+        )
+        return self._build_system_prompt(instructions), PROMPTS["code_writer_multi"].format(files=files)
+
+    def _drafts_from_multi_file_response(self, group: List[Dict[str, Any]], response: str) -> Dict[str, str]:
+        """
+        Map each file of a group to its drafted code. Files missing from the response (or a failed call)
+        get empty drafts, so the writer generates them itself.
+        """
+        drafts = {f["filename"]: "" for f in group}
+        if response.startswith("Error:"):
+            logger.warning(f"Could not draft {', '.join(drafts)}: {response}")
+            return drafts
+
+        entries = json_utils.extract_json_array(response)
+        if entries is None:
+            logger.error(f"No JSON array in the multi-file draft of {', '.join(drafts)}")
+            return drafts
+
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get("filename") not in drafts or not isinstance(entry.get("code"), str):
+                logger.warning(f"Skipping unexpected entry in multi-file draft: {str(entry)[:80]}")
+                continue
+            code = self._extract_code_from_response(entry["code"])
+            drafts[entry["filename"]] = code
+            logger.info(f"Drafted {len(code)} chars of GDScript code for {entry['filename']}")
+        return drafts
+
+    def _files_to_draft(self, state: GodotState) -> List[Dict[str, Any]]:
+        """Pick the pending files that have neither a draft nor generated code yet."""
+        drafts = state.get("drafts", {})
+        generated_code = state.get("generated_code", {})
+        processed_files = set(state.get("processed_files", []))
+
+        files = []
+        seen_filenames = set()
+        known = FileDedupTracker.known_filenames(generated_code.keys(), [], processed_files)
+        for file_def in state.get("pending_files", []):
+            if not isinstance(file_def, dict):
+                continue
+
+            filename = file_def.get("filename", "")
+            if not filename or filename == "Unnamed.gd" or filename in drafts:
+                continue
+
+            norm_filename = FileDedupTracker.normalize_filename(filename)
+            if norm_filename in seen_filenames:
+                continue
+            seen_filenames.add(norm_filename)
+
+            if norm_filename in known:
+                continue
+
+            files.append(file_def)
+
+        return files
+
+    def _draft_from_response(self, filename: str, response: str) -> str:
+        """
+        Extract the drafted code from Claude's response.
+        Failed calls are recorded as empty drafts so the writer falls back to generating the file itself.
+        """
+        if response.startswith("Error:"):
+            logger.warning(f"Could not draft {filename}: {response}")
+            return ""
+
+        code = self._extract_code_from_response(response)
+        logger.info(f"Drafted {len(code)} chars of GDScript code for {filename}")
+        return code
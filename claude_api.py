@@ -1,100 +1,578 @@
 import os
-import requests
-import json
+import atexit
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import importlib.util
+from functools import lru_cache
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple, Union
 from time import sleep
-import re
-from langchain_anthropic import ChatAnthropic
 
-from config import CLAUDE_MODEL, CLAUDE_MAX_TOKENS
+from tenacity import AsyncRetrying, Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+import json_utils
+from llm_cache import LLMCache, llm_cache, semantic_cache
+from rate_limiter import claude_rate_limiter
+from config import (
+    CLAUDE_MODEL,
+    CLAUDE_MAX_TOKENS,
+    CLAUDE_TEMPERATURE,
+    CLAUDE_TIMEOUT,
+    CLAUDE_CONNECT_TIMEOUT,
+    CLAUDE_BATCH_POLL_INTERVAL,
+    CLAUDE_BATCH_POLL_MAX_INTERVAL,
+    CLAUDE_MAX_ATTEMPTS,
+    CLAUDE_RETRY_MAX_WAIT
+)
 
 logger = logging.getLogger(__name__)
 
-# Load from .env
-from dotenv import load_dotenv
-load_dotenv()
+@lru_cache(maxsize=1)
+def _get_api_key() -> Optional[str]:
+    """Read ANTHROPIC_API_KEY once, falling back to .env only when it isn't already set."""
+    if "ANTHROPIC_API_KEY" not in os.environ:
+        from dotenv import load_dotenv
+        load_dotenv(override=False)
+    return os.environ.get("ANTHROPIC_API_KEY")
 
 # Try to import Anthropic's library if available
 try:
-    ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
-    client = ChatAnthropic(api_key=ANTHROPIC_API_KEY, model=CLAUDE_MODEL, max_tokens=CLAUDE_MAX_TOKENS) 
+    from anthropic import (
+        Anthropic, AsyncAnthropic, DefaultHttpxClient, DefaultAsyncHttpxClient, Timeout,
+        APIConnectionError, InternalServerError, RateLimitError
+    )
+    ANTHROPIC_API_KEY = _get_api_key()
+    
+    # Transient failures worth retrying: 429 rate limits, 5xx/529 overloads, timeouts and dropped connections
+    _RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+    
+    # One pooled client per process so every call reuses warm keep-alive connections
+    # instead of paying TCP + TLS setup again. HTTP/2 is used when the h2 package is installed.
+    _http2 = importlib.util.find_spec("h2") is not None
+    _timeout = Timeout(CLAUDE_TIMEOUT, connect=CLAUDE_CONNECT_TIMEOUT)
+    # Retries are handled by _with_retries (jittered backoff + Retry-After), not the SDK
+    client = Anthropic(
+        api_key=ANTHROPIC_API_KEY,
+        timeout=_timeout,
+        max_retries=0,
+        http_client=DefaultHttpxClient(http2=_http2)
+    )
+    # Shared async client so concurrent calls reuse one connection pool
+    async_client = AsyncAnthropic(
+        api_key=ANTHROPIC_API_KEY,
+        timeout=_timeout,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(http2=_http2)
+    )
+    # Close the pooled connections cleanly at interpreter exit; the async client's pool
+    # belongs to an event loop that is gone by then, so it is left to the garbage collector
+    atexit.register(client.close)
 except ImportError:
     logger.warning("Anthropic library not found. Using mock responses.")
     client = None
+    async_client = None
+    _RETRYABLE_ERRORS = ()
+
+# A system prompt is a string, or a sequence of strings/text blocks sent in order (e.g. shared premise first)
+SystemPrompt = Optional[Union[str, Sequence[Union[str, Dict[str, Any]]]]]
 
-def call_claude(prompt: str, model: str = CLAUDE_MODEL, max_tokens: int = CLAUDE_MAX_TOKENS) -> str:
+def get_client():
+    """Return the shared Anthropic client (patch this in tests to inject a mock)."""
+    return client
+
+def get_async_client():
+    """Return the shared AsyncAnthropic client (patch this in tests to inject a mock)."""
+    return async_client
+
+def call_claude(prompt: str, model: str = CLAUDE_MODEL, max_tokens: int = CLAUDE_MAX_TOKENS,
+                temperature: Optional[float] = CLAUDE_TEMPERATURE, system: SystemPrompt = None) -> str:
     """
     Calls the Claude API with the given prompt.
+    Responses are served from the on-disk LLM cache when the same request was made before,
+    or from the semantic cache (if enabled) when a sufficiently similar one was.
     
     Args:
         prompt: The prompt to send to Claude
         model: The model name to use
         max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature (defaults to CLAUDE_TEMPERATURE; None keeps the API default)
+        system: Static system prompt, either a string (sent as one prompt-cached block) or a list of content blocks
         
     Returns:
         Claude's response as a string
     """
     logger.info(f"Calling Claude API with prompt of length {len(prompt)}")
     
-    if not client:
+    claude_client = get_client()
+    if not claude_client:
         logger.warning("No Anthropic client available. Using mock response.")
         return _generate_mock_response(prompt)
     
+    request = _build_request(prompt, model, max_tokens, temperature, system)
+    cached = _cached_response(request)
+    if cached is not None:
+        return cached
+    
     try:
-        message = client.invoke(prompt)
-        response = message.content
-        return response
+        response = _with_retries(_create_text, claude_client, request)
     except Exception as e:
         logger.error(f"Error calling Claude API: {e}")
         return f"Error: {str(e)}"
+    
+    _store_response(request, response)
+    return response
 
-def _generate_mock_response(prompt: str) -> str:
+async def acall_claude(prompt: str, model: str = CLAUDE_MODEL, max_tokens: int = CLAUDE_MAX_TOKENS,
+                       temperature: Optional[float] = CLAUDE_TEMPERATURE, system: SystemPrompt = None) -> str:
     """
-    Generate a mock response when Claude API is not available.
-    This is a simple implementation that just returns placeholder GDScript.
+    Async variant of call_claude, used by nodes that fan out several Claude calls at once.
     
     Args:
-        prompt: The original prompt that would have been sent to Claude
+        prompt: The prompt to send to Claude
+        model: The model name to use
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature (defaults to CLAUDE_TEMPERATURE; None keeps the API default)
+        system: Static system prompt, either a string (sent as one prompt-cached block) or a list of content blocks
         
     Returns:
-        A mock response with basic GDScript code
+        Claude's response as a string
     """
-    logger.warning("Using mock response - NO REAL CLAUDE API IS BEING CALLED")
+    logger.info(f"Calling Claude API (async) with prompt of length {len(prompt)}")
+    
+    claude_client = get_async_client()
+    if not claude_client:
+        logger.warning("No Anthropic client available. Using mock response.")
+        return _generate_mock_response(prompt)
     
-    # Extract filename from the prompt if possible
-    filename_match = re.search(r'GDScript file named [\'"]([^\'"]+)[\'"]', prompt)
-    filename = filename_match.group(1) if filename_match else "Unknown.gd"
+    request = _build_request(prompt, model, max_tokens, temperature, system)
+    cached = await asyncio.to_thread(_cached_response, request)
+    if cached is not None:
+        return cached
     
-    # Create a very basic GDScript file based on the filename
-    class_name = filename.replace(".gd", "").capitalize()
+    try:
+        response = await _awith_retries(_acreate_text, claude_client, request)
+    except Exception as e:
+        logger.error(f"Error calling Claude API: {e}")
+        return f"Error: {str(e)}"
     
-    mock_script = f"""
-extends Node
+    await asyncio.to_thread(_store_response, request, response)
+    return response
 
-class_name {class_name}
+def call_claude_tool(prompt: str, tool: Dict[str, Any], model: str = CLAUDE_MODEL, max_tokens: int = CLAUDE_MAX_TOKENS,
+                     temperature: Optional[float] = CLAUDE_TEMPERATURE, system: SystemPrompt = None) -> Optional[Dict[str, Any]]:
+    """
+    Calls Claude with a single tool it is required to use and returns the tool's input,
+    already parsed and shaped by the tool's input_schema, so no JSON has to be extracted
+    from text. Cached like call_claude (as the JSON of the input).
+    
+    Args:
+        prompt: The prompt to send to Claude
+        tool: Tool definition (name, description, input_schema)
+        model: The model name to use
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature (defaults to CLAUDE_TEMPERATURE; None keeps the API default)
+        system: Static system prompt, either a string (sent as one prompt-cached block) or a list of content blocks
+        
+    Returns:
+        The tool input as a dict, or None when the call failed, was cut off at max_tokens or no client is available
+    """
+    logger.info(f"Calling Claude API with tool {tool['name']} and prompt of length {len(prompt)}")
+    
+    claude_client = get_client()
+    if not claude_client:
+        logger.warning("No Anthropic client available; tool calls have no mock response.")
+        return None
+    
+    request = _build_request(prompt, model, max_tokens, temperature, system)
+    request["tools"] = [tool]
+    request["tool_choice"] = {"type": "tool", "name": tool["name"]}
+    cache_key = _cache_key(request)
+    cached = llm_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return json_utils.loads(cached)
+    
+    try:
+        tool_input = _with_retries(_create_tool_input, claude_client, request)
+    except Exception as e:
+        logger.error(f"Error calling Claude API: {e}")
+        return None
+    
+    if tool_input is not None and cache_key:
+        llm_cache.set(cache_key, json_utils.dumps(tool_input).decode("utf-8"))
+    return tool_input
 
-# This is a mock script created when Claude API was unavailable
-# You should replace this with actual implementation
+def call_claude_stream(prompt: str, model: str = CLAUDE_MODEL, max_tokens: int = CLAUDE_MAX_TOKENS,
+                       temperature: Optional[float] = CLAUDE_TEMPERATURE, system: SystemPrompt = None,
+                       until: Optional[Callable[[str], bool]] = None,
+                       retry_max_tokens: Optional[int] = None) -> str:
+    """
+    Streaming variant of call_claude. Text is accumulated as it arrives and the stream is
+    closed as soon as until(chunk) returns True, so callers that only need part of the
+    response (e.g. the first code block) don't wait for the trailing tokens.
+    
+    Args:
+        prompt: The prompt to send to Claude
+        model: The model name to use
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature (defaults to CLAUDE_TEMPERATURE; None keeps the API default)
+        system: Static system prompt, either a string (sent as one prompt-cached block) or a list of content blocks
+        until: Called with each text chunk; return True to stop streaming early
+        retry_max_tokens: Larger budget to request the response again with when it is cut off at max_tokens
+        
+    Returns:
+        Claude's response (up to the point where streaming stopped) as a string
+    """
+    logger.info(f"Streaming Claude API response for prompt of length {len(prompt)}")
+    
+    claude_client = get_client()
+    if not claude_client:
+        logger.warning("No Anthropic client available. Using mock response.")
+        return _generate_mock_response(prompt)
+    
+    request = _build_request(prompt, model, max_tokens, temperature, system)
+    cached = _cached_response(request)
+    if cached is not None:
+        return cached
+    
+    try:
+        response, stop_reason = _with_retries(_stream_text, claude_client, request, until)
+    except Exception as e:
+        logger.error(f"Error calling Claude API: {e}")
+        return f"Error: {str(e)}"
+    
+    if stop_reason == "max_tokens":
+        # A cut-off response is never cached; ask again with the larger budget if there is one. until()
+        # has already seen the cut-off text (a fence scanner would take the new opening fence for the
+        # closing one), so the retry streams to the end instead.
+        if retry_max_tokens and retry_max_tokens > max_tokens:
+            logger.warning(f"Response cut off at {max_tokens} tokens; retrying with {retry_max_tokens}")
+            return call_claude_stream(prompt, model, retry_max_tokens, temperature, system)
+        logger.warning(f"Response cut off at {max_tokens} tokens")
+        return response
+    
+    _store_response(request, response)
+    return response
 
-var name: String = "{class_name}"
-var active: bool = true
+async def acall_claude_stream(prompt: str, model: str = CLAUDE_MODEL, max_tokens: int = CLAUDE_MAX_TOKENS,
+                              temperature: Optional[float] = CLAUDE_TEMPERATURE, system: SystemPrompt = None,
+                              until: Optional[Callable[[str], bool]] = None,
+                              retry_max_tokens: Optional[int] = None) -> str:
+    """
+    Async variant of call_claude_stream.
+    
+    Args:
+        prompt: The prompt to send to Claude
+        model: The model name to use
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature (defaults to CLAUDE_TEMPERATURE; None keeps the API default)
+        system: Static system prompt, either a string (sent as one prompt-cached block) or a list of content blocks
+        until: Called with each text chunk; return True to stop streaming early
+        retry_max_tokens: Larger budget to request the response again with when it is cut off at max_tokens
+        
+    Returns:
+        Claude's response (up to the point where streaming stopped) as a string
+    """
+    logger.info(f"Streaming Claude API response (async) for prompt of length {len(prompt)}")
+    
+    claude_client = get_async_client()
+    if not claude_client:
+        logger.warning("No Anthropic client available. Using mock response.")
+        return _generate_mock_response(prompt)
+    
+    request = _build_request(prompt, model, max_tokens, temperature, system)
+    cached = await asyncio.to_thread(_cached_response, request)
+    if cached is not None:
+        return cached
+    
+    try:
+        response, stop_reason = await _awith_retries(_astream_text, claude_client, request, until)
+    except Exception as e:
+        logger.error(f"Error calling Claude API: {e}")
+        return f"Error: {str(e)}"
+    
+    if stop_reason == "max_tokens":
+        if retry_max_tokens and retry_max_tokens > max_tokens:
+            logger.warning(f"Response cut off at {max_tokens} tokens; retrying with {retry_max_tokens}")
+            return await acall_claude_stream(prompt, model, retry_max_tokens, temperature, system)
+        logger.warning(f"Response cut off at {max_tokens} tokens")
+        return response
+    
+    await asyncio.to_thread(_store_response, request, response)
+    return response
 
-func _ready() -> void:
-    print("{class_name} initialized")
+def call_claude_batch(prompts: List[str], model: str = CLAUDE_MODEL, max_tokens: int = CLAUDE_MAX_TOKENS,
+                      temperature: Optional[float] = CLAUDE_TEMPERATURE, system: SystemPrompt = None) -> List[str]:
+    """
+    Sends several independent prompts through the Message Batches API in one round-trip
+    and waits for all of them. Batched requests are billed at a discount, but results can
+    take minutes to arrive, so this suits cold runs where throughput matters more than latency.
+    
+    Args:
+        prompts: The prompts to send to Claude (all share the same model, parameters and system prompt)
+        model: The model name to use
+        max_tokens: Maximum tokens to generate per prompt
+        temperature: Sampling temperature (defaults to CLAUDE_TEMPERATURE; None keeps the API default)
+        system: Static system prompt shared by every request in the batch
+        
+    Returns:
+        Claude's responses in the same order as prompts ("Error: ..." for requests that failed)
+    """
+    logger.info(f"Calling Claude Message Batches API with {len(prompts)} prompt(s)")
+    
+    claude_client = get_client()
+    if not claude_client:
+        logger.warning("No Anthropic client available. Using mock responses.")
+        return [_generate_mock_response(prompt) for prompt in prompts]
     
-func get_name() -> String:
-    return name
+    requests = [_build_request(prompt, model, max_tokens, temperature, system) for prompt in prompts]
+    responses: List[Optional[str]] = [_cached_response(request) for request in requests]
+    batch_requests = []
+    for i, request in enumerate(requests):
+        if responses[i] is None:
+            # custom_id only allows [a-zA-Z0-9_-], so requests are identified by position
+            batch_requests.append({"custom_id": f"request-{i}", "params": request})
     
-func is_active() -> bool:
-    return active
+    if not batch_requests:
+        return responses
+    
+    # Resume a batch submitted for exactly these requests by an interrupted run instead of paying for it twice
+    batch_key = LLMCache.make_key(requests=batch_requests)
+    try:
+        batch_id = llm_cache.get_batch_id(batch_key)
+        if batch_id:
+            logger.info(f"Resuming message batch {batch_id}")
+            batch = _with_retries(claude_client.messages.batches.retrieve, batch_id)
+        else:
+            batch = _with_retries(claude_client.messages.batches.create, requests=batch_requests)
+            llm_cache.set_batch_id(batch_key, batch.id)
+            logger.info(f"Submitted message batch {batch.id}")
+        
+        # Poll with exponential backoff: batches take anywhere from seconds to hours
+        poll_interval = CLAUDE_BATCH_POLL_INTERVAL
+        while batch.processing_status != "ended":
+            sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, CLAUDE_BATCH_POLL_MAX_INTERVAL)
+            batch = _with_retries(claude_client.messages.batches.retrieve, batch.id)
+        
+        for entry in claude_client.messages.batches.results(batch.id):
+            i = int(entry.custom_id.split("-")[1])
+            if entry.result.type == "succeeded":
+                responses[i] = _message_text(entry.result.message)
+                _store_response(requests[i], responses[i])
+            else:
+                logger.error(f"Batch request {entry.custom_id} {entry.result.type}")
+        llm_cache.clear_batch_id(batch_key)
+    except Exception as e:
+        logger.error(f"Error calling Claude Message Batches API: {e}")
+        return [response if response is not None else f"Error: {str(e)}" for response in responses]
+    
+    return [response if response is not None else "Error: batch request did not succeed" for response in responses]
+
+def _create_text(claude_client, request: Dict[str, Any]) -> str:
+    """Send one request once the rate limiter allows it, and return the response text."""
+    estimate = _estimate_tokens(request)
+    claude_rate_limiter.acquire(estimate)
+    message = claude_client.messages.create(**request)
+    claude_rate_limiter.record(estimate, _usage_tokens(message, estimate))
+    return _message_text(message)
+
+def _create_tool_input(claude_client, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Send one tool-use request once the rate limiter allows it, and return the forced tool's input."""
+    estimate = _estimate_tokens(request)
+    claude_rate_limiter.acquire(estimate)
+    message = claude_client.messages.create(**request)
+    claude_rate_limiter.record(estimate, _usage_tokens(message, estimate))
+    if message.stop_reason == "max_tokens":
+        # The tool input was cut off mid-way; whatever was parsed of it is incomplete
+        logger.error(f"Claude's {request['tool_choice']['name']} call was cut off at {request['max_tokens']} tokens")
+        return None
+    for block in message.content:
+        if block.type == "tool_use":
+            return block.input
+    logger.error(f"Claude did not call {request['tool_choice']['name']} (stop reason: {message.stop_reason})")
+    return None
+
+async def _acreate_text(claude_client, request: Dict[str, Any]) -> str:
+    """Async variant of _create_text."""
+    estimate = _estimate_tokens(request)
+    await claude_rate_limiter.aacquire(estimate)
+    message = await claude_client.messages.create(**request)
+    claude_rate_limiter.record(estimate, _usage_tokens(message, estimate))
+    return _message_text(message)
+
+def _stream_text(claude_client, request: Dict[str, Any],
+                 until: Optional[Callable[[str], bool]]) -> Tuple[str, Optional[str]]:
+    """
+    Stream one response, stopping early once until(chunk) returns True. Returns the text and
+    the API's stop_reason (None when the stream was stopped early).
+    """
+    estimate = _estimate_tokens(request)
+    claude_rate_limiter.acquire(estimate)
+    chunks = []
+    stop_reason = None
+    try:
+        with claude_client.messages.stream(**request) as stream:
+            for text in stream.text_stream:
+                chunks.append(text)
+                if until and until(text):
+                    logger.info("Stopping Claude stream early")
+                    break
+            else:
+                stop_reason = stream.current_message_snapshot.stop_reason
+    except _RETRYABLE_ERRORS as e:
+        if chunks:
+            # until() has already consumed part of this response, so a retry can't start over cleanly
+            raise RuntimeError(f"Stream interrupted after {len(chunks)} chunk(s): {e}") from e
+        raise
+    text = "".join(chunks)
+    claude_rate_limiter.record(estimate, estimate + len(text) // 4)
+    return text, stop_reason
+
+async def _astream_text(claude_client, request: Dict[str, Any],
+                        until: Optional[Callable[[str], bool]]) -> Tuple[str, Optional[str]]:
+    """Async variant of _stream_text."""
+    estimate = _estimate_tokens(request)
+    await claude_rate_limiter.aacquire(estimate)
+    chunks = []
+    stop_reason = None
+    try:
+        async with claude_client.messages.stream(**request) as stream:
+            async for text in stream.text_stream:
+                chunks.append(text)
+                if until and until(text):
+                    logger.info("Stopping Claude stream early")
+                    break
+            else:
+                stop_reason = stream.current_message_snapshot.stop_reason
+    except _RETRYABLE_ERRORS as e:
+        if chunks:
+            raise RuntimeError(f"Stream interrupted after {len(chunks)} chunk(s): {e}") from e
+        raise
+    text = "".join(chunks)
+    claude_rate_limiter.record(estimate, estimate + len(text) // 4)
+    return text, stop_reason
+
+def _estimate_tokens(request: Dict[str, Any]) -> int:
+    """Rough input token count of a request (about 4 characters per token) for the rate limiter."""
+    chars = sum(len(message["content"]) for message in request["messages"])
+    chars += sum(len(block.get("text", "")) for block in request.get("system", []))
+    return chars // 4
+
+def _usage_tokens(message, estimate: int) -> int:
+    """Input + output tokens billed for a response, falling back to the estimate when usage is missing."""
+    usage = getattr(message, "usage", None)
+    if usage is None:
+        return estimate
+    return usage.input_tokens + usage.output_tokens
+
+_jittered_backoff = wait_random_exponential(multiplier=1, max=CLAUDE_RETRY_MAX_WAIT)
+
+def _retry_wait(retry_state) -> float:
+    """
+    Exponential backoff with full jitter, capped at CLAUDE_RETRY_MAX_WAIT.
+    When the API sends a Retry-After header (rate limits, overloads) that delay is used instead.
+    """
+    error = retry_state.outcome.exception()
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), CLAUDE_RETRY_MAX_WAIT)
+        except ValueError:
+            pass
+    return _jittered_backoff(retry_state)
+
+def _log_retry(retry_state) -> None:
+    error = retry_state.outcome.exception()
+    logger.warning(
+        f"Claude API call failed (attempt {retry_state.attempt_number}/{CLAUDE_MAX_ATTEMPTS}): {error}. "
+        f"Retrying in {retry_state.next_action.sleep:.1f}s"
+    )
+
+# Shared retry policy for every Claude request
+_RETRY_POLICY = dict(
+    retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+    wait=_retry_wait,
+    stop=stop_after_attempt(CLAUDE_MAX_ATTEMPTS),
+    before_sleep=_log_retry,
+    reraise=True
+)
+
+def _with_retries(fn: Callable, *args, **kwargs):
+    """Call fn, retrying transient API errors per _RETRY_POLICY."""
+    return Retrying(**_RETRY_POLICY)(fn, *args, **kwargs)
+
+async def _awith_retries(fn: Callable, *args, **kwargs):
+    """Await fn, retrying transient API errors per _RETRY_POLICY."""
+    return await AsyncRetrying(**_RETRY_POLICY)(fn, *args, **kwargs)
+
+def _build_request(prompt: str, model: str, max_tokens: int, temperature: Optional[float],
+                   system: SystemPrompt = None) -> Dict[str, Any]:
+    """Assemble the Messages API parameters for a single-prompt request."""
+    request = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+    if system:
+        request["system"] = _system_blocks(system)
+    if temperature is not None:
+        request["temperature"] = temperature
+    return request
+
+def _system_blocks(system: SystemPrompt) -> List[Dict[str, Any]]:
+    """
+    Wrap plain system prompt strings in text blocks marked for Anthropic's prompt cache,
+    so repeated calls sharing the same static preamble only pay for the dynamic user part.
+    Each string gets its own breakpoint, so calls that share only a leading block still hit the cache.
+    """
+    if isinstance(system, str):
+        system = [system]
+    return [
+        {"type": "text", "text": block, "cache_control": {"type": "ephemeral"}} if isinstance(block, str) else block
+        for block in system
+    ]
+
+def _cache_key(request: Dict[str, Any]) -> Optional[str]:
+    """
+    Cache key for a request, or None when it shouldn't be cached.
+    Requests that explicitly ask for sampling (temperature > 0) always go to the API.
+    """
+    if request.get("temperature", 0) > 0:
+        return None
+    return LLMCache.make_key(**request)
+
+def _cached_response(request: Dict[str, Any]) -> Optional[str]:
+    """Look a request up in the exact-match cache, then in the semantic cache."""
+    cache_key = _cache_key(request)
+    if not cache_key:
+        return None
     
-func set_active(value: bool) -> void:
-    active = value
+    cached = llm_cache.get(cache_key)
+    if cached is None:
+        cached = semantic_cache.get(_semantic_namespace(request), request["messages"][0]["content"])
+    return cached
+
+def _store_response(request: Dict[str, Any], response: str) -> None:
+    """Record a successful response in both caches."""
+    cache_key = _cache_key(request)
+    if not cache_key:
+        return
     
-# NOTE: This is a mock implementation - please implement real functionality
-"""
-    return mock_script
+    llm_cache.set(cache_key, response)
+    semantic_cache.set(_semantic_namespace(request), request["messages"][0]["content"], response)
+
+def _semantic_namespace(request: Dict[str, Any]) -> str:
+    """Semantic cache entries are only shared between requests with the same model and parameters."""
+    return LLMCache.make_key(**{k: v for k, v in request.items() if k != "messages"})
+
+def _message_text(message) -> str:
+    """Join the text blocks of a Messages API response."""
+    return "".join(block.text for block in message.content if block.type == "text")
+
+def _generate_mock_response(prompt: str) -> str:
+    """Placeholder GDScript used when no Anthropic client is available (mocks is only imported on this path)."""
+    from mocks import generate_mock_response
+    return generate_mock_response(prompt)
 
 if __name__ == "__main__":
 		prompt = "Print a function that takes a string and returns it in uppercase."
@@ -1,29 +1,129 @@
+import re
+import asyncio
 import logging
-from typing import Dict, Any, List, Literal
+from typing import Dict, Any, List, Literal, Optional, Tuple, Union
 from langgraph.graph import StateGraph, START
 from langgraph.types import Command
 
 from state import GodotState
-from claude_api import call_claude
-from config import PROMPTS
+from claude_api import call_claude, acall_claude
+from config import PROMPTS, CLAUDE_REVIEW_MODEL, CLAUDE_REVIEW_MAX_TOKENS, CODE_VALIDATION_RULES, SKIP_LLM_REVIEW_WHEN_CLEAN
 
 logger = logging.getLogger(__name__)
 
+# Variables declared without a type (`var x: int` and `var x := 1` are both typed)
+_VAR_RE = re.compile(r'^\s*var\s+(\w+)\b(?!\s*:)')
+_FUNC_RE = re.compile(r'^\s*func\s+\w+\(')
+_TODO_MARKERS = ("TODO", "FIXME", "PLACEHOLDER")
+_ERROR_HANDLING_MARKERS = ("push_error", "push_warning", "printerr(", "assert(", "is_instance_valid(")
+
+def _comment_start(line: str) -> int:
+    """Index of the '#' that starts a comment on line, ignoring any inside string literals; -1 if none."""
+    quote = None
+    escaped = False
+    for index, char in enumerate(line):
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "#":
+            return index
+    return -1
+
+def _split_params(line: str, start: int) -> List[str]:
+    """
+    Split the parameter list that opens at line[start] (just past the '(') at its top-level
+    commas, so commas inside default values like Vector2(1, 2) or strings don't split a parameter.
+    """
+    params = []
+    depth = 0
+    quote = None
+    escaped = False
+    current = start
+    for index in range(start, len(line)):
+        char = line[index]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            if depth == 0:
+                params.append(line[current:index])
+                break
+            depth -= 1
+        elif char == "," and depth == 0:
+            params.append(line[current:index])
+            current = index + 1
+    return [param.strip() for param in params if param.strip()]
+
 class CodeReviewNode:
     """
-    Uses Claude LLM to review code for issues and provide feedback.
-    Acts as a "smart" reviewer rather than using fixed validation rules.
+    Reviews code with local CODE_VALIDATION_RULES checks first, then uses Claude
+    as a "smart" reviewer for anything the rules can't settle.
     """
     def __init__(self, name: str, max_iterations: int = 1):
         self.name = name
         self.max_iterations = max_iterations  # Store max iterations as instance variable
         logger.info(f"CodeReviewNode initialized: {name} with max {max_iterations} revision(s)")
         
-    def __call__(self, state: GodotState):
+    async def __call__(self, state: GodotState):
         """Make node callable for LangGraph"""
-        return self.invoke(state)
+        return await self.ainvoke(state)
 
     def invoke(self, state: GodotState) -> Command[Literal["code_writer", "file_processor"]]:
+        prompt = self._prepare_review(state)
+        if isinstance(prompt, Command):
+            return prompt
+        
+        current_file = state["current_file"]
+        issues = self._validate_gdscript(current_file.get("code", ""), current_file["filename"])
+        
+        # Have Claude evaluate the code, unless the cheap local checks already passed
+        feedback = ""
+        if prompt and self._needs_llm_review(current_file, issues):
+            system, user = prompt
+            feedback = call_claude(user, model=CLAUDE_REVIEW_MODEL, max_tokens=CLAUDE_REVIEW_MAX_TOKENS, system=system)
+        return self._route_review(state, feedback, issues)
+
+    async def ainvoke(self, state: GodotState) -> Command[Literal["code_writer", "file_processor"]]:
+        prompt = self._prepare_review(state)
+        if isinstance(prompt, Command):
+            return prompt
+        
+        # Run the local rule checks in a worker thread so other files' Claude calls keep progressing
+        current_file = state["current_file"]
+        issues = await asyncio.to_thread(self._validate_gdscript, current_file.get("code", ""), current_file["filename"])
+        
+        feedback = ""
+        if prompt and self._needs_llm_review(current_file, issues):
+            system, user = prompt
+            feedback = await acall_claude(user, model=CLAUDE_REVIEW_MODEL, max_tokens=CLAUDE_REVIEW_MAX_TOKENS, system=system)
+        return self._route_review(state, feedback, issues)
+
+    def _needs_llm_review(self, current_file: Dict[str, Any], issues: List[str]) -> bool:
+        """A first draft that passes every local rule is approved without a Claude round-trip."""
+        if SKIP_LLM_REVIEW_WHEN_CLEAN and not issues and current_file.get("iteration", 1) == 1:
+            logger.info(f"{current_file['filename']} passed local validation, skipping LLM review")
+            return False
+        return True
+
+    def _prepare_review(self, state: GodotState) -> Union[Command, Optional[Tuple[str, str]]]:
+        """
+        Validate the file under review and build the (system, user) review prompt.
+        Returns a Command when the file can't be reviewed, or None once max iterations are reached.
+        """
         current_file = state.get("current_file", {})
         instructions = state.get("instructions", {})
         
@@ -46,22 +146,22 @@ class CodeReviewNode:
         
         logger.info(f"Reviewing {filename} (iteration {iteration})")
         
-        # Get existing collections or create new ones
-        generated_code = state.get("generated_code", {})
-        review_status = state.get("review_status", {})
-        detailed_reviews = state.get("detailed_reviews", {})
-        
-        # Get processed_files and ensure it's a set for operations (but store as list)
-        processed_files = state.get("processed_files", [])
-        if not isinstance(processed_files, set):
-            processed_files = set(processed_files)
-        
         # Only do a full LLM review if we haven't reached max iterations
         if iteration < self.max_iterations:
-            # Have Claude evaluate the code
-            review_prompt = self._build_review_prompt(filename, code_text, purpose, instructions.get("game_premise", ""))
-            feedback = call_claude(review_prompt)
-            
+            return self._build_review_prompt(filename, code_text, purpose, instructions.get("game_premise", ""))
+        return None
+
+    def _route_review(self, state: GodotState, feedback: str, issues: List[str]) -> Command[Literal["code_writer", "file_processor"]]:
+        """
+        Send the file back for revision if Claude raised issues, otherwise approve it.
+        Local validation issues are recorded with the approval.
+        """
+        current_file = state["current_file"]
+        code_text = current_file.get("code", "")
+        filename = current_file["filename"]
+        iteration = current_file.get("iteration", 1)
+        
+        if feedback:
             logger.info(f"Received feedback on {filename} from Claude")
             
             # Simply check if feedback indicates any issues by its length
@@ -84,31 +184,106 @@ class CodeReviewNode:
         # If no issues found or we've reached max iterations, proceed
         logger.info(f"Code for {filename} approved or max iterations reached")
         review_message = "Code meets requirements." if iteration == 1 else f"Completed after {iteration} iteration(s)."
-        review_status[filename] = "Approved"
         
-        # Store the code and reviews
-        generated_code[filename] = code_text
-        detailed_reviews[filename] = {
-            "feedback": review_message,
-            "issues": []
-        }
-        
-        # Convert processed_files back to a list for state storage
+        # Only this file's entries are returned (dict_merge_reducer merges them); the state's dicts are
+        # never modified in place. processed_files is left untouched: the file processor marks the file as processed
         return Command(
             goto="file_processor",
             update={
-                "generated_code": generated_code,
-                "review_status": review_status,
-                "detailed_reviews": detailed_reviews,
-                "current_file": {"status": "completed", "filename": filename},
-                "processed_files": list(processed_files)  # Ensure it's stored as a list
+                "generated_code": {filename: code_text},
+                "review_status": {filename: "Approved"},
+                "detailed_reviews": {filename: {"feedback": review_message, "issues": issues}},
+                "current_file": {"status": "completed", "filename": filename}
             }
         )
     
-    def _build_review_prompt(self, filename: str, code: str, purpose: str, game_premise: str) -> str:
-        """Build a prompt for the LLM to review the code."""
-        return PROMPTS["code_review"].format(
+    def _build_review_prompt(self, filename: str, code: str, purpose: str, game_premise: str) -> Tuple[str, str]:
+        """Build a prompt for the LLM to review the code: static reviewer instructions plus the file to review."""
+        return PROMPTS["code_review_system"], PROMPTS["code_review"].format(
             filename=filename,
             code=code,
             purpose=purpose,
         )
+
+    def _validate_gdscript(self, code: str, filename: str) -> List[str]:
+        """
+        Check code against CODE_VALIDATION_RULES in a single pass over its lines.
+        Returns human-readable issues; an empty list means every rule passed.
+        """
+        rules = CODE_VALIDATION_RULES
+        has_extends = has_class_name = has_ready = has_signal = has_load = has_error_handling = False
+        lines = code.splitlines()
+        line_count = len(lines)
+        comment_count = 0
+        untyped_vars: List[str] = []
+        untyped_params: List[str] = []
+        todo_lines: List[int] = []
+        mixed_indent_lines: List[int] = []
+
+        for line_number, line in enumerate(lines, 1):
+            stripped = line.lstrip()
+            if not stripped:
+                continue
+
+            indent = line[:len(line) - len(stripped)]
+            if "\t" in indent and " " in indent:
+                mixed_indent_lines.append(line_number)
+
+            if _comment_start(stripped) >= 0:
+                comment_count += 1  # Full-line or trailing comment
+
+            if stripped.startswith("extends "):
+                has_extends = True
+            elif stripped.startswith("class_name "):
+                has_class_name = True
+            elif stripped.startswith("signal "):
+                has_signal = True
+            elif stripped.startswith("func _ready("):
+                has_ready = True
+
+            if "load(" in stripped:
+                has_load = True
+            if not has_error_handling and any(marker in stripped for marker in _ERROR_HANDLING_MARKERS):
+                has_error_handling = True
+            if any(marker in stripped for marker in _TODO_MARKERS):
+                todo_lines.append(line_number)
+
+            var_match = _VAR_RE.match(line)
+            if var_match:
+                untyped_vars.append(var_match.group(1))
+            func_match = _FUNC_RE.match(line)
+            if func_match:
+                # A parameter is typed when its name (before any default) carries ": Type" or ":="
+                untyped_params.extend(
+                    param for param in _split_params(line, func_match.end())
+                    if ":" not in param.split("=", 1)[0]
+                )
+
+        issues = []
+        if rules.get("require_extends") and not has_extends:
+            issues.append("Missing 'extends' statement")
+        if rules.get("enforce_static_typing"):
+            if untyped_vars:
+                issues.append(f"Variables without type hints: {', '.join(untyped_vars)}")
+            if untyped_params:
+                issues.append(f"Function parameters without type hints: {', '.join(untyped_params)}")
+        if rules.get("require_class_name_for_reusable") and not has_class_name:
+            issues.append("Missing class_name declaration")
+        min_comments = rules.get("min_comments_ratio", 0)
+        if line_count > 10 and comment_count < min_comments:
+            issues.append(f"Only {comment_count} comment(s); expected at least {min_comments}")
+        if rules.get("require_signals_for_complex") and line_count > 15 and not has_signal:
+            issues.append("No signals declared in a non-trivial script")
+        if rules.get("check_indentation") and mixed_indent_lines:
+            issues.append(f"Mixed tabs and spaces in indentation on line(s): {', '.join(map(str, mixed_indent_lines))}")
+        if rules.get("no_todos") and todo_lines:
+            issues.append(f"TODO/placeholder markers on line(s): {', '.join(map(str, todo_lines))}")
+        ready_types = rules.get("require_ready_function", [])
+        if not has_ready and any(name in filename for name in ready_types):
+            issues.append("Missing _ready() function")
+        if rules.get("require_error_handling") and has_load and not has_error_handling:
+            issues.append("Loads resources without any error handling")
+
+        if issues:
+            logger.info(f"Local validation found {len(issues)} issue(s) in {filename}")
+        return issues
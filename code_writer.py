@@ -1,15 +1,63 @@
 import logging
-from typing import Dict, Any, Literal
+from functools import lru_cache
+from typing import Dict, Any, Literal, Optional, Tuple
 from langgraph.graph import StateGraph, START
 from langgraph.types import Command
-from claude_api import call_claude
+from claude_api import call_claude_stream, acall_claude_stream, SystemPrompt
 import re
 
 from state import GodotState
-from config import PROMPTS, GODOT_VERSION, DESIGN_CONSTRAINTS
+from config import PROMPTS, GODOT_VERSION, DESIGN_CONSTRAINTS, MAX_TOKENS_BY_PURPOSE
 
 logger = logging.getLogger(__name__)
 
+_DESIGN_CONSTRAINTS_TEXT = "\n".join(DESIGN_CONSTRAINTS) if isinstance(DESIGN_CONSTRAINTS, list) else DESIGN_CONSTRAINTS
+
+# Base classes and filename endings that mark a UI script
+_UI_BASE_CLASSES = frozenset(["Control", "CanvasLayer", "Panel", "PanelContainer", "Label", "Button"])
+_UI_SUFFIXES = ("ui.gd", "hud.gd", "menu.gd", "panel.gd", "screen.gd")
+_UTIL_MARKERS = ("util", "helper")
+
+# First fenced code block in a response (optionally tagged gdscript)
+_CODE_RE = re.compile(r"```(?:gdscript)?\s*([\s\S]*?)```")
+
+@lru_cache(maxsize=8)
+def _writer_system_prompt(game_premise: str) -> Tuple[str, str]:
+    """
+    Format the writer system prompt once per game premise instead of once per file.
+    The premise block comes first so its cache entry is shared with the planner's calls.
+    """
+    return (
+        PROMPTS["game_premise_system"].format(game_premise=game_premise),
+        PROMPTS["code_writer_system"].format(
+            godot_version=GODOT_VERSION,
+            design_constraints=_DESIGN_CONSTRAINTS_TEXT
+        )
+    )
+
+class CodeFenceScanner:
+    """
+    Watches streamed text for the end of the first ``` code block, so the writer
+    can stop streaming once the code is complete instead of waiting for trailing prose.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.code_start = -1  # Index just past the opening fence, once seen
+
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk of streamed text; returns True once the closing fence has arrived."""
+        # Only rescan the new text, plus two chars in case a fence straddles chunks
+        scan_from = max(0, len(self.buffer) - 2)
+        self.buffer += chunk
+        
+        if self.code_start < 0:
+            start = self.buffer.find("```", scan_from)
+            if start < 0:
+                return False
+            self.code_start = start + 3
+        
+        return self.buffer.find("```", max(scan_from, self.code_start)) >= 0
+
 class CodeWriterNode:
     """
     Interacts with Claude 3.7 to produce GDScript files.
@@ -18,11 +66,42 @@ class CodeWriterNode:
         self.name = name
         logger.info(f"CodeWriterNode initialized: {name}")
 	
-    def __call__(self, state: GodotState):
+    async def __call__(self, state: GodotState):
         """Make node callable for LangGraph"""
-        return self.invoke(state)
+        return await self.ainvoke(state)
 
     def invoke(self, state: GodotState) -> Command[Literal["code_review"]]:
+        command, prompt = self._prepare(state)
+        if command is not None:
+            return command
+            
+        # Call Claude API through our helper
+        filename = state["current_file"]["filename"]
+        logger.info(f"Calling Claude API for {filename}")
+        system, user = prompt
+        max_tokens = self._max_tokens_for(state["current_file"])
+        response = call_claude_stream(user, max_tokens=max_tokens, system=system, until=CodeFenceScanner().feed,
+                                      retry_max_tokens=MAX_TOKENS_BY_PURPOSE["default"])
+        return self._build_command(state["current_file"], response)
+
+    async def ainvoke(self, state: GodotState) -> Command[Literal["code_review"]]:
+        command, prompt = self._prepare(state)
+        if command is not None:
+            return command
+            
+        filename = state["current_file"]["filename"]
+        logger.info(f"Calling Claude API (async) for {filename}")
+        system, user = prompt
+        max_tokens = self._max_tokens_for(state["current_file"])
+        response = await acall_claude_stream(user, max_tokens=max_tokens, system=system, until=CodeFenceScanner().feed,
+                                             retry_max_tokens=MAX_TOKENS_BY_PURPOSE["default"])
+        return self._build_command(state["current_file"], response)
+
+    def _prepare(self, state: GodotState) -> Tuple[Optional[Command], Tuple[SystemPrompt, str]]:
+        """
+        Validate the current file and build its (system, user) prompt.
+        Returns a Command instead of a prompt when no Claude call is needed.
+        """
         instructions = state.get("instructions", {})
         current_file = state.get("current_file", {})
         
@@ -30,7 +109,7 @@ class CodeWriterNode:
             logger.error("No current file to process in CodeWriterNode")
             return Command(goto="code_review", update={
                 "current_file": {"status": "skipped"}
-            })
+            }), ("", "")
         
         filename = current_file.get("filename", "")
         
@@ -39,13 +118,13 @@ class CodeWriterNode:
             logger.error("Missing filename in CodeWriterNode")
             return Command(goto="code_review", update={
                 "current_file": {"status": "skipped"}
-            })
+            }), ("", "")
             
         if filename == "Unnamed.gd":
             logger.error("Found unnamed file in CodeWriterNode")
             return Command(goto="code_review", update={
                 "current_file": {"status": "skipped"}
-            })
+            }), ("", "")
             
         purpose = current_file.get("purpose", "")
         iteration = current_file.get("iteration", 1)
@@ -56,19 +135,30 @@ class CodeWriterNode:
         
         # Build a prompt based on whether this is the first iteration or a revision
         if iteration == 1:
+            # Reuse the draft written ahead of time by the batch code writer
+            draft = state.get("drafts", {}).get(filename)
+            if draft:
+                logger.info(f"Using pre-generated draft for {filename}")
+                return self._build_command(current_file, draft, extract=False), ("", "")
             prompt = self._build_initial_prompt(instructions, filename, purpose, current_file.get("details", {}))
             logger.info(f"Created initial prompt for {filename}")
         else:
             prompt = self._build_revision_prompt(instructions, filename, purpose, previous_code, feedback)
             logger.info(f"Created revision prompt for {filename} (iteration {iteration})")
-            
-        # Call Claude API through our helper
-        logger.info(f"Calling Claude API for {filename}")
-        response = call_claude(prompt)
-        logger.info(f"Received response from Claude for {filename} ({len(response)} chars)")
         
-        # Extract code from Claude's response
-        code = self._extract_code_from_response(response)
+        return None, prompt
+
+    def _build_command(self, current_file: Dict[str, Any], response: str, extract: bool = True) -> Command:
+        """Turn Claude's response into the state update for the review step."""
+        filename = current_file["filename"]
+        iteration = current_file.get("iteration", 1)
+        
+        if extract:
+            logger.info(f"Received response from Claude for {filename} ({len(response)} chars)")
+            # Extract code from Claude's response
+            code = self._extract_code_from_response(response)
+        else:
+            code = response
         logger.info(f"Extracted {len(code)} chars of GDScript code for {filename}")
         
         # Update state with generated code
@@ -84,27 +174,40 @@ class CodeWriterNode:
             }
         )
     
+    def _max_tokens_for(self, file_def: Dict[str, Any]) -> int:
+        """Pick the output budget for a file from the planner's singleton/extends fields and its filename."""
+        filename = file_def.get("filename", "").lower()
+        if file_def.get("singleton"):
+            kind = "singleton"
+        elif file_def.get("extends") in _UI_BASE_CLASSES or filename.endswith(_UI_SUFFIXES):
+            kind = "ui"
+        elif any(marker in filename for marker in _UTIL_MARKERS):
+            kind = "util"
+        else:
+            kind = "default"
+        return MAX_TOKENS_BY_PURPOSE.get(kind, MAX_TOKENS_BY_PURPOSE["default"])
+    
+    def _build_system_prompt(self, instructions):
+        """Static part of every writer prompt (premise and guidelines), identical for all files in a run."""
+        return _writer_system_prompt(instructions.get("game_premise", ""))
+    
     def _build_initial_prompt(self, instructions, filename, purpose, details):
-        game_premise = instructions.get("game_premise", "")
-        
-        # Include details if available
-        details_section = ""
-        if details:
-            details_section = "Additional details:\n"
-            for key, value in details.items():
-                details_section += f"- {key}: {value}\n"
-        
-        return PROMPTS["code_writer_initial"].format(
-            game_premise=game_premise,
+        return self._build_system_prompt(instructions), PROMPTS["code_writer_initial"].format(
             filename=filename,
             purpose=purpose,
-            details_section=details_section,
-            godot_version=GODOT_VERSION, 
-            design_constraints="\n".join(DESIGN_CONSTRAINTS) if isinstance(DESIGN_CONSTRAINTS, list) else DESIGN_CONSTRAINTS
+            details_section=self._details_section(details)
         )
     
+    def _details_section(self, details):
+        """List the planner's extra details for a file, if there are any."""
+        if not details:
+            return ""
+        parts = ["Additional details:\n"]
+        parts.extend(f"- {key}: {value}\n" for key, value in details.items())
+        return "".join(parts)
+    
     def _build_revision_prompt(self, instructions, filename, purpose, previous_code, feedback):
-        return PROMPTS["code_writer_revision"].format(
+        return self._build_system_prompt(instructions), PROMPTS["code_writer_revision"].format(
             filename=filename,
             purpose=purpose,
             previous_code=previous_code,
@@ -114,8 +217,7 @@ class CodeWriterNode:
     def _extract_code_from_response(self, response):
         """Extract code from Claude's response, handling potential formatting variations."""
         # First, try to find code between gdscript code blocks
-        code_pattern = r"```(?:gdscript)?\s*([\s\S]*?)```"
-        match = re.search(code_pattern, response)
+        match = _CODE_RE.search(response)
         
         if (match):
             # Return the code found within code blocks
@@ -1,6 +1,7 @@
 """
 Centralized configuration for the GDScript LangGraph code generation pipeline.
 """
+import sys
 
 # General settings
 MAX_ITERATIONS_PER_FILE = 5
@@ -9,6 +10,42 @@ GODOT_VERSION = "Godot 4.x"
 # Claude API settings
 CLAUDE_MODEL = "claude-3-7-sonnet-20250219"
 CLAUDE_MAX_TOKENS = 8192
+# Writer output budget by kind of file; output tokens dominate latency, and small scripts don't need the full cap
+MAX_TOKENS_BY_PURPOSE = {
+    "singleton": 4000,
+    "ui": 2500,
+    "util": 1500,
+    "default": CLAUDE_MAX_TOKENS
+}
+CLAUDE_TEMPERATURE = 0.0  # Deterministic output keeps regenerated files stable and the response cache useful
+CLAUDE_REVIEW_MODEL = "claude-haiku-4-5"  # Reviews are short classification-style calls; the writer stays on CLAUDE_MODEL
+CLAUDE_REVIEW_MAX_TOKENS = 800
+CLAUDE_TIMEOUT = 60.0  # Seconds per request
+CLAUDE_CONNECT_TIMEOUT = 5.0
+CLAUDE_MAX_ATTEMPTS = 6  # Attempts per request for rate-limit/overload/connection errors
+CLAUDE_RETRY_MAX_WAIT = 30.0  # Cap in seconds for a single backoff sleep
+CLAUDE_RPM = 50  # Requests per minute allowed by the account's rate limits (0 disables the limiter)
+CLAUDE_TPM = 40000  # Input + output tokens per minute (0 disables the limiter)
+MAX_CONCURRENT_CLAUDE_CALLS = 8  # Upper bound on files written in parallel (file pipeline wave size, concurrent drafting)
+DRAFT_STRATEGY = "concurrent"  # "concurrent" (each parallel branch drafts its own file), "multi_file" (several files per request) or "message_batches" (draft all in one discounted, slower batch first)
+DRAFT_FILES_PER_REQUEST = 3  # Files drafted by one request with the "multi_file" strategy
+DRAFT_MULTI_FILE_MAX_TOKENS = 16000  # Cap on a multi-file request's output budget (the SDK refuses much larger non-streaming requests)
+PLAN_WITH_DRAFTS = False  # Ask the planner for a first draft of every file in the same request; the writer/review loop then starts from those drafts
+CLAUDE_BATCH_POLL_INTERVAL = 5.0  # Seconds before the first Message Batches status check (doubles each poll)
+CLAUDE_BATCH_POLL_MAX_INTERVAL = 60.0
+DEPENDENCY_SCAN_CHARS = 8192  # Leading characters of a file scanned for referenced classes (0 scans the whole file)
+DEPENDENCY_ANALYSIS_CODE_TOKENS = 1500  # Estimated tokens of source code sent with a dependency analysis request
+DEPENDENCY_ANALYSIS_MAX_TOKENS = 1024  # Output budget per source file; the response is a short JSON array
+DEPENDENCY_ANALYSIS_FILES_PER_REQUEST = 4  # Completed files analyzed together; larger sets are split into concurrent requests
+LLM_CACHE_DIRECTORY = ".llm_cache"  # On-disk Claude response cache (disable with CLAUDE_CACHE=off)
+LLM_CACHE_MEMORY_ENTRIES = 256  # Responses also kept in memory for the current run
+CLAUDE_CACHE_MAX_MB = 200  # Least recently used responses are evicted from disk past this size
+LLM_CACHE_TTL_DAYS = 7  # Responses written longer ago than this are fetched again (0 keeps them indefinitely)
+
+# Semantic response cache (needs sentence-transformers; CLAUDE_SEMANTIC_CACHE=on|off overrides)
+SEMANTIC_CACHE_ENABLED = False
+SEMANTIC_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.92  # Minimum cosine similarity for a hit
 
 CORE_GAME_DESCRIPTION = """
 ### **Competitive Automation RTS : Game Concept**
@@ -109,6 +146,9 @@ KEY_MECHANICS = [
 # Default output directory for generated code
 OUTPUT_DIRECTORY = "generated_code"
 
+# Approve first drafts that pass every local validation rule without an LLM review
+SKIP_LLM_REVIEW_WHEN_CLEAN = True
+
 # Code validation rules
 CODE_VALIDATION_RULES = {
     "require_extends": True,
@@ -123,7 +163,8 @@ CODE_VALIDATION_RULES = {
 }
 
 # Basic Godot types that shouldn't be treated as dependencies
-BASIC_GODOT_TYPES = [
+# (frozenset of interned names: only ever used for membership tests)
+BASIC_GODOT_TYPES = frozenset(map(sys.intern, [
     "Node", "Node2D", "Sprite2D", "Control", "Button", "Label", "LineEdit", 
     "TextureButton", "CanvasLayer", "Camera2D", "Area2D", "CollisionShape2D",
     "RigidBody2D", "StaticBody2D", "CharacterBody2D", "Timer", "AudioStreamPlayer",
@@ -140,18 +181,19 @@ BASIC_GODOT_TYPES = [
     "RayCast2D", "Path2D", "PathFollow2D", "EditorPlugin", "EditorScript",
     "MultiplayerAPI", "MultiplayerPeer", "NetworkedMultiplayerPeer", "Position2D",
     # Add more types if needed
-]
+]))
 
 # Prompts for Claude
 PROMPTS = {
     # Code Writer prompts
-    "code_writer_initial": """
-You are an expert GDScript programmer. I'm building a Godot 4 game that blends Factorio and Nexus Wars mechanics.
+    # Shared first system block for every prompt about the game, so its prompt cache entry is reused across nodes
+    "game_premise_system": """
+I'm building a Godot 4 game that blends Factorio and Nexus Wars mechanics.
 Game premise: {game_premise}
+""",
 
-Please write a GDScript file named '{filename}' that serves the purpose of: {purpose}
-
-{details_section}
+    "code_writer_system": """
+You are an expert GDScript programmer working on the game described above.
 
 Follow these coding guidelines:
 - Use {godot_version} syntax
@@ -164,12 +206,30 @@ Follow these coding guidelines:
 - Handle potential errors gracefully
 {design_constraints}
 
-Please provide ONLY the GDScript code with no additional explanation. The code should be valid GDScript that can be used directly in Godot 4.
+Always provide ONLY the GDScript code with no additional explanation. The code should be valid GDScript that can be used directly in Godot 4.
 """,
 
-    "code_writer_revision": """
-You are an expert GDScript programmer. I'm building a Godot 4 game that blends Factorio and Nexus Wars mechanics.
+    "code_writer_initial": """
+Please write a GDScript file named '{filename}' that serves the purpose of: {purpose}
+
+{details_section}
+""",
+
+    "code_writer_multi": """
+Please write each of the following GDScript files:
+{files}
+Return a JSON array with one object per file, in the order above, each file's complete code as a JSON string:
+[{{"filename": "Example.gd", "code": "extends Node\\n..."}}]
 
+Return valid JSON only, with no code fences or explanations.
+""",
+
+    "code_writer_multi_file": """
+## {filename}
+Purpose: {purpose}
+{details_section}""",
+
+    "code_writer_revision": """
 You previously wrote this GDScript file named '{filename}' for the purpose: {purpose}
 
 Here is your previous code:
@@ -180,7 +240,7 @@ Here is your previous code:
 I need you to revise this code based on the following feedback:
 {feedback}
 
-Please provide ONLY the improved GDScript code with no additional explanation. The code should be valid GDScript that can be used directly in Godot 4.
+Please provide ONLY the improved GDScript code with no additional explanation.
 """,
 
     # File Processor prompts
@@ -190,7 +250,7 @@ Based on these names and the context from {source_file}, create JSON definitions
 
 Here's the source code that referenced them:
 ```gdscript
-{code}... (truncated)
+{code}
 ```
 
 For each missing dependency, define:
@@ -207,11 +267,38 @@ For each missing dependency, define:
 Return valid JSON array only, no explanations.
 """,
 
-    # Supervisor prompts
-    "file_planning": """
-You are an expert Godot game developer creating a plan for a new game.
+    "dependency_analysis_batch": """
+Several scripts reference classes/scripts that don't exist yet. For each source file below,
+create JSON definitions for its missing files based on their names and the source code.
 
-Game concept: {game_premise}
+{sources}
+
+For each missing dependency, define:
+{{
+  "filename": "[ClassName].gd",
+  "purpose": "Brief description of purpose",
+  "extends": "Most appropriate Godot class",
+  "details": {{
+    "responsibilities": ["main responsibility"],
+    "dependencies": []
+  }}
+}}
+
+Return a valid JSON object only, no explanations, mapping each source filename to the array of
+definitions for its missing dependencies.
+""",
+
+    "dependency_analysis_source": """
+## {source_file}
+Missing: {dependencies}
+```gdscript
+{code}
+```
+""",
+
+    # Supervisor prompts
+    "file_planning_system": """
+You are an expert Godot game developer creating a plan for the game described above.
 
 I need you to analyze this game concept and list all necessary GDScript files that should be created.
 For each file, provide:
@@ -229,28 +316,22 @@ Focus on creating a complete architecture that covers:
 - UI elements
 - Helper utilities
 
-Format your response as a JSON array with objects having these fields:
-[
-  {{
-    "filename": "example.gd", 
-    "purpose": "what this file does",
-    "extends": "Node2D",
-    "singleton": true/false,
-    "dependencies": ["other_file.gd"],
-    "details": {{
-      "responsibilities": ["feature1", "feature2"],
-      "key_methods": ["method1", "method2"]
-    }}
-  }}
-]
+Return the plan by calling the plan_files tool, with one entry per file.
+""",
 
-Provide only the JSON array, no explanations or markdown.
+    "file_planning": """
+Plan the GDScript files for this game.
 """,
 
-    "code_review": """
+    "file_planning_with_drafts": """
+Plan the GDScript files for this game.
+Also fill in initial_code for every file with a complete first draft of its GDScript.
+""",
+
+    "code_review_system": """
 You are an expert GDScript code reviewer.
 
-Please evaluate this code and provide feedback if you find any issues that would prevent it from working properly.
+Please evaluate the code you are given and provide feedback if you find any issues that would prevent it from working properly.
 Focus on critical issues like:
 1. Syntax errors
 2. Missing 'extends' statements
@@ -260,7 +341,9 @@ Focus on critical issues like:
 
 If the code looks good, just reply with "The code looks good and should work correctly."
 Otherwise, provide specific feedback about what needs to be fixed.
+""",
 
+    "code_review": """
 Review the following code for a file named '{filename}' 
 that serves the purpose: "{purpose}".
 
@@ -268,5 +351,56 @@ Here is the code:
 ```gdscript
 {code}
 ```
+""",
+
+    # Scene setup prompts
+    "scene_setup_system": """
+You are a Godot engine expert helping to set up scenes for the game described above.
+Based on the generated GDScript files you are given, provide step-by-step instructions for creating scenes.
+
+Please provide clear, numbered steps for setting up the main scenes needed for this game prototype.
+Include node hierarchy, script attachments, and any necessary configurations.
+""",
+
+    "scene_setup": """
+Files:
+{file_list}
+
+Code samples:
+{code_samples}
 """
 }
+
+# Tool the file planner is made to call, so the plan comes back as validated JSON rather than text
+FILE_PLANNING_TOOL = {
+    "name": "plan_files",
+    "description": "Record the GDScript files to generate for the game.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "files": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "filename": {"type": "string", "description": "Script filename with the .gd extension"},
+                        "purpose": {"type": "string", "description": "What this file does"},
+                        "extends": {"type": "string", "description": "Class the script extends (Node, Node2D, Control, ...)"},
+                        "singleton": {"type": "boolean", "description": "Whether the script is an autoload"},
+                        "dependencies": {"type": "array", "items": {"type": "string"}},
+                        "details": {
+                            "type": "object",
+                            "properties": {
+                                "responsibilities": {"type": "array", "items": {"type": "string"}},
+                                "key_methods": {"type": "array", "items": {"type": "string"}}
+                            }
+                        },
+                        "initial_code": {"type": "string", "description": "First draft of the file's GDScript, only when asked for"}
+                    },
+                    "required": ["filename", "purpose"]
+                }
+            }
+        },
+        "required": ["files"]
+    }
+}
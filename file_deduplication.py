@@ -1,8 +1,13 @@
 import logging
-from typing import List, Dict, Any, Set
+from functools import lru_cache
+from typing import Collection, List, Dict, Any, Optional, Set
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=4096)
+def _normalize(filename: str) -> str:
+    return filename.lower().strip().replace('\\', '/').split('/')[-1]
+
 class FileDedupTracker:
     """
     Helper class to track files and ensure they don't get reprocessed.
@@ -12,21 +17,41 @@ class FileDedupTracker:
         """Normalize a filename for consistent comparison."""
         if not filename:
             return ""  # Return empty string for None or empty filenames
-        return filename.lower().strip().replace('\\', '/').split('/')[-1]
+        # Pure and called for the same names over and over, so results are memoized
+        return _normalize(filename)
     
+    @staticmethod
+    def known_filenames(existing_files: Collection[str],
+                        pending_files: List[Dict[str, Any]],
+                        processed_files: set) -> Set[str]:
+        """
+        Build the set of normalized filenames tracked in any form, so that checking
+        many candidates costs one set lookup each instead of a scan over every collection.
+        """
+        known = {FileDedupTracker.normalize_filename(f) for f in existing_files}
+        known.update(
+            FileDedupTracker.normalize_filename(p.get("filename", ""))
+            for p in pending_files if isinstance(p, dict)
+        )
+        known.update(FileDedupTracker.get_processed_filenames(processed_files))
+        known.discard("")
+        return known
+
     @staticmethod
     def is_duplicate_file(filename: str, 
-                        existing_files: List[str], 
+                        existing_files: Collection[str], 
                         pending_files: List[Dict[str, Any]],
-                        processed_files: set) -> bool:
+                        processed_files: set,
+                        known: Optional[Set[str]] = None) -> bool:
         """
         Check if a file is already being tracked in any form.
         
         Args:
             filename: The filename to check
-            existing_files: List of filenames in generated_code
+            existing_files: Filenames in generated_code (any collection, e.g. its keys view)
             pending_files: List of pending file definitions
             processed_files: Set of filenames that have been processed
+            known: Prebuilt known_filenames() set; pass it when checking many files against the same collections
             
         Returns:
             bool: True if the file is a duplicate
@@ -39,30 +64,13 @@ class FileDedupTracker:
         if not norm_filename:
             return True
         
-        # Check existing files (normalize them too)
-        for existing_file in existing_files:
-            if FileDedupTracker.normalize_filename(existing_file) == norm_filename:
-                return True
-        
-        # Check pending files
-        for pending_file in pending_files:
-            if not isinstance(pending_file, dict):
-                continue
-                
-            pending_filename = pending_file.get("filename", "")
-            if FileDedupTracker.normalize_filename(pending_filename) == norm_filename:
-                return True
-        
-        # Check processed files
-        for proc_file in processed_files:
-            if FileDedupTracker.normalize_filename(proc_file) == norm_filename:
-                return True
-                
-        return False
+        if known is None:
+            known = FileDedupTracker.known_filenames(existing_files, pending_files, processed_files)
+        return norm_filename in known
     
     @staticmethod
     def deduplicate_dependencies(dependencies: List[Dict[str, Any]], 
-                               existing_files: List[str],
+                               existing_files: Collection[str],
                                pending_files: List[Dict[str, Any]], 
                                processed_files: set) -> List[Dict[str, Any]]:
         """
@@ -70,7 +78,7 @@ class FileDedupTracker:
         
         Args:
             dependencies: List of dependency file definitions
-            existing_files: List of filenames in generated_code
+            existing_files: Filenames in generated_code (any collection, e.g. its keys view)
             pending_files: List of pending file definitions
             processed_files: Set of filenames that have been processed
             
@@ -79,6 +87,7 @@ class FileDedupTracker:
         """
         unique_deps = []
         seen_filenames = set()  # Track filenames seen in this batch
+        known = FileDedupTracker.known_filenames(existing_files, pending_files, processed_files)
         
         for dep in dependencies:
             if not isinstance(dep, dict):
@@ -103,9 +112,7 @@ class FileDedupTracker:
                 
             seen_filenames.add(norm_filename)
             
-            if not FileDedupTracker.is_duplicate_file(
-                filename, existing_files, pending_files, processed_files
-            ):
+            if norm_filename and norm_filename not in known:
                 unique_deps.append(dep)
                 logger.debug(f"Adding unique dependency: {filename}")
             else:
@@ -0,0 +1,70 @@
+import logging
+from typing import Dict, Any, Literal
+
+from langgraph.types import Command, Send
+
+from code_writer import CodeWriterNode
+from code_review import CodeReviewNode
+from state import GodotState
+
+logger = logging.getLogger(__name__)
+
+# State keys a finished branch hands back; they all merge with dict_merge_reducer
+_RESULT_KEYS = ("generated_code", "review_status", "detailed_reviews")
+
+class FilePipelineNode:
+    """
+    Runs the whole writer/review loop for a single file, so the file processor can fan
+    a wave of pending files out to parallel branches with Send instead of writing them
+    one at a time. Each branch works on its own copy of the state it needs and only the
+    reviewed results are merged back.
+    """
+    def __init__(self, name: str, code_writer: CodeWriterNode, code_review: CodeReviewNode):
+        self.name = name
+        self.code_writer = code_writer
+        self.code_review = code_review
+        logger.info(f"FilePipelineNode initialized: {name}")
+
+    async def __call__(self, state: GodotState):
+        """Make node callable for LangGraph"""
+        return await self.ainvoke(state)
+
+    @staticmethod
+    def send(state: GodotState, file_def: Dict[str, Any]) -> Send:
+        """Build the Send for one branch: the instructions, the file and its draft, if one was written."""
+        branch_state = {"instructions": state.get("instructions", {}), "current_file": file_def}
+        draft = state.get("drafts", {}).get(file_def["filename"])
+        if draft:
+            branch_state["drafts"] = {file_def["filename"]: draft}
+        return Send("file_pipeline", branch_state)
+
+    def invoke(self, state: GodotState) -> Command[Literal["file_processor"]]:
+        branch_state = dict(state)
+        command = self.code_writer.invoke(branch_state)
+        while command.goto in ("code_writer", "code_review"):
+            branch_state.update(command.update or {})
+            step = self.code_writer if command.goto == "code_writer" else self.code_review
+            command = step.invoke(branch_state)
+        return self._finish(command)
+
+    async def ainvoke(self, state: GodotState) -> Command[Literal["file_processor"]]:
+        branch_state = dict(state)
+        command = await self.code_writer.ainvoke(branch_state)
+        while command.goto in ("code_writer", "code_review"):
+            branch_state.update(command.update or {})
+            step = self.code_writer if command.goto == "code_writer" else self.code_review
+            command = await step.ainvoke(branch_state)
+        return self._finish(command)
+
+    def _finish(self, command: Command) -> Command[Literal["file_processor"]]:
+        """
+        Pass on the review's results for this file only. current_file is left out: every branch
+        of a wave finishes a different file, and the file processor picks them all up from generated_code.
+        """
+        update = command.update or {}
+        filename = (update.get("current_file") or {}).get("filename", "")
+        logger.info(f"File pipeline finished {filename or 'a skipped file'}")
+        return Command(
+            goto="file_processor",
+            update={key: update[key] for key in _RESULT_KEYS if key in update}
+        )
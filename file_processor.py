@@ -1,17 +1,121 @@
+import asyncio
+import string
+import hashlib
 import logging
-from typing import Dict, Any, Literal, List, Set, Tuple
+from collections import OrderedDict, deque
+from typing import Callable, Collection, Dict, Any, Literal, List, Optional, Set, Tuple
 import re
 from langgraph.graph import StateGraph, START
 from langgraph.types import Command
-import json
+import json_utils
 
-from claude_api import call_claude
+from claude_api import call_claude, acall_claude
+from file_pipeline import FilePipelineNode
 from state import GodotState
-from config import PROMPTS, BASIC_GODOT_TYPES
+from config import (
+    PROMPTS,
+    BASIC_GODOT_TYPES,
+    DEPENDENCY_ANALYSIS_CODE_TOKENS,
+    DEPENDENCY_ANALYSIS_FILES_PER_REQUEST,
+    DEPENDENCY_ANALYSIS_MAX_TOKENS,
+    DEPENDENCY_SCAN_CHARS,
+    DRAFT_STRATEGY,
+    MAX_CONCURRENT_CLAUDE_CALLS
+)
 from file_deduplication import FileDedupTracker
 
 logger = logging.getLogger(__name__)
 
+# Everything in generated code that suggests a dependency on another file, as one alternation
+# so the code is scanned once; the named group that matched says which kind of reference it was
+_RE_DEPENDENCY = re.compile(
+    r'(?:var|const)\s+\w+\s*:\s*(?P<class_ref>\w+)'                         # 1. Class references
+    r'|extends\s+(?P<extends>\w+)'                                          # 2. Extends statements
+    r'|preload\s*\(\s*["\']res://(?:scripts/)?(?P<preload>\w+)\.gd["\']'      # 3. Preloads and loads
+    r'|load\s*\(\s*["\']res://(?:scripts/)?(?P<load>\w+)\.gd["\']'
+    r'|(?P<instance>\w+)\.new\(\)'                                           # 4. Instantiate calls
+    r'|#\s*requires\s*:\s*(?P<requires>\w+)\.gd'                             # 5. Explicit requires comments
+)
+
+def _truncate_for_analysis(code: str, max_tokens: int = DEPENDENCY_ANALYSIS_CODE_TOKENS) -> str:
+    """
+    Fit code into roughly max_tokens (estimated at 4 chars per token) for a dependency analysis prompt.
+    Keeps whole lines from the head, where extends/class_name/preload statements live, and from the tail.
+    """
+    budget = max_tokens * 4
+    if len(code) <= budget:
+        return code
+    
+    lines = code.splitlines()
+    head, tail = [], []
+    head_chars = tail_chars = 0
+    
+    # Spend two thirds of the budget on the head and the rest on the tail
+    for line in lines:
+        if head_chars + len(line) + 1 > budget * 2 // 3:
+            break
+        head.append(line)
+        head_chars += len(line) + 1
+    for line in reversed(lines[len(head):]):
+        if head_chars + tail_chars + len(line) + 1 > budget:
+            break
+        tail.append(line)
+        tail_chars += len(line) + 1
+    
+    omitted = len(lines) - len(head) - len(tail)
+    return "\n".join([*head, f"# ... ({omitted} lines omitted)", *reversed(tail)])
+
+def _compile_prompt(template: str) -> Callable[..., str]:
+    """
+    Parse a PROMPTS template once into literal text and field names, so filling it in is a plain join
+    instead of str.format re-parsing the whole template (brace escapes included) on every call.
+    Only bare {field} placeholders are supported, which is all the dependency prompts use.
+    """
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if spec or conversion:
+            raise ValueError(f"Conversions and format specs are not supported (field {field!r})")
+        parts.append((literal, field))
+    return lambda **values: "".join(
+        literal + values[field] if field is not None else literal
+        for literal, field in parts
+    )
+
+_DEPENDENCY_PROMPT = _compile_prompt(PROMPTS["dependency_analysis"])
+_DEPENDENCY_BATCH_PROMPT = _compile_prompt(PROMPTS["dependency_analysis_batch"])
+_DEPENDENCY_SOURCE_PROMPT = _compile_prompt(PROMPTS["dependency_analysis_source"])
+
+# Validated dependency definitions per (source file, code hash), so re-analyzing identical code skips Claude
+_DEPENDENCY_CACHE: "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]" = OrderedDict()
+_DEPENDENCY_CACHE_SIZE = 256
+
+def _dependency_cache_key(source_file: str, code: str) -> Tuple[str, str]:
+    return source_file, hashlib.blake2b(code.encode("utf-8"), digest_size=16).hexdigest()
+
+def _cached_dependencies(source_file: str, code: str) -> Optional[List[Dict[str, Any]]]:
+    """Definitions from an earlier analysis of exactly this code, or None."""
+    key = _dependency_cache_key(source_file, code)
+    cached = _DEPENDENCY_CACHE.get(key)
+    if cached is not None:
+        _DEPENDENCY_CACHE.move_to_end(key)
+    return cached
+
+def _remember_dependencies(completed: List[Tuple[str, str]],
+                           definitions_by_source: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Cache each source's definitions (before dedup, so entries don't depend on queue state) and flatten them."""
+    codes = dict(completed)
+    dependencies = []
+    for source_file, definitions in definitions_by_source.items():
+        _DEPENDENCY_CACHE[_dependency_cache_key(source_file, codes[source_file])] = definitions
+        while len(_DEPENDENCY_CACHE) > _DEPENDENCY_CACHE_SIZE:
+            _DEPENDENCY_CACHE.popitem(last=False)
+        dependencies.extend(definitions)
+    return dependencies
+
+def _is_valid_file_entry(file_info: Any) -> bool:
+    """A queued file definition needs to be a dict with a real filename."""
+    return isinstance(file_info, dict) and bool(file_info.get("filename")) and file_info["filename"] != "Unnamed.gd"
+
 class FileProcessorNode:
     """
     Processes files and manages the file generation queue.
@@ -19,302 +123,407 @@ class FileProcessorNode:
     """
     def __init__(self, name: str):
         self.name = name
-        logger.info(f"FileProcessorNode initialized: {name}")
+        logger.info("FileProcessorNode initialized: %s", name)
         
-    def __call__(self, state: GodotState):
+    async def __call__(self, state: GodotState):
         """Make node callable for LangGraph"""
-        return self.invoke(state)
+        return await self.ainvoke(state)
 
-    def invoke(self, state: GodotState) -> Command[Literal["code_writer", "scene_setup"]]:
-        pending_files = state.get("pending_files", [])
-        generated_code = state.get("generated_code", {})
-        
-        # Get processed_files and ensure it's a set for our operations
-        processed_files = state.get("processed_files", [])
-        if not isinstance(processed_files, set):
-            processed_files = set(processed_files)
-        
-        # Check for completed files to detect dependencies
-        newest_file = None
-        newest_code = None
+    def invoke(self, state: GodotState) -> Command[Literal["code_writer", "file_pipeline", "batch_code_writer", "scene_setup"]]:
+        pending_files, generated_code, processed_files, tracking, completed = self._collect(state)
         
-        # Find the most recently completed file
-        current_file = state.get("current_file", {})
-        if current_file and current_file.get("status") == "completed":
-            newest_file = current_file.get("filename")
-            if newest_file and newest_file in generated_code and newest_file not in processed_files:
-                newest_code = generated_code[newest_file]
-        
-        # If we have a new file, detect dependencies
+        # If we have newly completed files, detect their dependencies
         new_dependencies = []
-        if newest_file and newest_code:
-            logger.info(f"Detecting dependencies in completed file: {newest_file}")
-            # Add the file to processed_files set
-            processed_files.add(newest_file)
+        if completed:
+            sources = [filename for filename, _ in completed]
+            logger.info("Detecting dependencies in completed file(s): %s", ', '.join(sources))
             
             new_dependencies = self._detect_dependencies(
-                newest_file, 
-                newest_code, 
-                list(generated_code.keys()),
+                completed, 
+                generated_code.keys(),
                 processed_files,
                 pending_files
             )
-            if new_dependencies:
-                logger.info(f"Found {len(new_dependencies)} new dependencies in {newest_file}")
-                
-                # Validate dependencies before adding them
-                valid_dependencies = []
-                for dep in new_dependencies:
-                    if not dep.get("filename"):
-                        logger.error(f"Skipping dependency with missing filename from {newest_file}")
-                        continue
-                    if dep.get("filename") == "Unnamed.gd":
-                        logger.error(f"Skipping unnamed dependency from {newest_file}")
-                        continue
-                    valid_dependencies.append(dep)
-                
-                if len(valid_dependencies) != len(new_dependencies):
-                    logger.warning(f"Filtered out {len(new_dependencies) - len(valid_dependencies)} invalid dependencies")
-                
-                pending_files.extend(valid_dependencies)
+        return self._route(state, pending_files, generated_code, processed_files, tracking, completed, new_dependencies)
+
+    async def ainvoke(self, state: GodotState) -> Command[Literal["code_writer", "file_pipeline", "batch_code_writer", "scene_setup"]]:
+        pending_files, generated_code, processed_files, tracking, completed = self._collect(state)
+        
+        # The dependency analysis call runs on the event loop, alongside any other in-flight Claude requests
+        new_dependencies = []
+        if completed:
+            sources = [filename for filename, _ in completed]
+            logger.info("Detecting dependencies in completed file(s): %s", ', '.join(sources))
+            
+            new_dependencies = await self._adetect_dependencies(
+                completed, 
+                generated_code.keys(),
+                processed_files,
+                pending_files
+            )
+        return self._route(state, pending_files, generated_code, processed_files, tracking, completed, new_dependencies)
+
+    def _collect(self, state: GodotState) -> Tuple[List[Dict[str, Any]], Dict[str, str], Set[str], Dict[str, Any], List[Tuple[str, str]]]:
+        """
+        Read the queue state and find every completed file that still needs dependency detection,
+        as (filename, code) pairs. Also returns the processed files as a set for lookups (including
+        the completed ones) and the processed_files/analyzed_files state update, which is empty
+        unless a file was completed so those lists aren't rebuilt on every step.
+        """
+        pending_files = state.get("pending_files", [])
+        generated_code = state.get("generated_code", {})
+        
+        # processed_files stays a list in state; the set is only for membership checks here
+        processed_list = state.get("processed_files", [])
+        processed_files = set(processed_list)
+        
+        # Only files that reached generated_code since the last analysis need looking at; the one
+        # that just finished review goes first, the rest in a stable order so prompts stay cacheable
+        analyzed_files = set(state.get("analyzed_files", ()))
+        new_files = set(generated_code) - analyzed_files
+        newest_file = (state.get("current_file") or {}).get("filename")
+        completed = [
+            (filename, generated_code[filename])
+            for filename in sorted(new_files, key=lambda filename: (filename != newest_file, filename))
+        ]
+        
+        tracking = {}
+        if completed:
+            newly_processed = [filename for filename, _ in completed if filename not in processed_files]
+            processed_files.update(newly_processed)
+            tracking = {
+                "processed_files": [*processed_list, *newly_processed],
+                "analyzed_files": analyzed_files | new_files
+            }
+        
+        return pending_files, generated_code, processed_files, tracking, completed
+
+    def _route(self, state: GodotState, pending_files: List[Dict[str, Any]], generated_code: Dict[str, str],
+               processed_files: Set[str], tracking: Dict[str, Any], completed: List[Tuple[str, str]],
+               new_dependencies: List[Dict[str, Any]]) -> Command[Literal["code_writer", "file_pipeline", "batch_code_writer", "scene_setup"]]:
+        """Queue newly found dependencies and decide which node handles the next file."""
+        valid_dependencies = []
+        if new_dependencies:
+            source_label = ", ".join(filename for filename, _ in completed)
+            logger.info("Found %s new dependencies in %s", len(new_dependencies), source_label)
+            
+            # Validate dependencies before adding them
+            for dep in new_dependencies:
+                if not dep.get("filename"):
+                    logger.error("Skipping dependency with missing filename from %s", source_label)
+                    continue
+                if dep.get("filename") == "Unnamed.gd":
+                    logger.error("Skipping unnamed dependency from %s", source_label)
+                    continue
+                valid_dependencies.append(dep)
+            
+            if len(valid_dependencies) != len(new_dependencies):
+                logger.warning("Filtered out %s invalid dependencies", len(new_dependencies) - len(valid_dependencies))
+            
+        # Work on a deque copy: popping from the front is O(1) and the state's own list is left untouched
+        queue = deque(pending_files)
+        queue.extend(valid_dependencies)
         
         # Safety check - break out of infinite loops by detecting if we've been processing for too long
         max_files_threshold = 100
         
         if len(processed_files) > max_files_threshold:
-            logger.warning(f"Processed more than {max_files_threshold} files. Terminating to avoid infinite loop.")
+            logger.warning("Processed more than %s files. Terminating to avoid infinite loop.", max_files_threshold)
             return Command(
                 goto="scene_setup",
                 update={
-                    "processed_files": list(processed_files),
+                    **tracking,
                     "pending_files": []
                 }
             )
         
-        # Emergency full reset of pending files if they contain invalid entries
-        valid_pending_files = []
-        for file_info in pending_files:
-            if not isinstance(file_info, dict):
-                continue
-                
-            if not file_info.get("filename"):
-                continue
-                
-            if file_info.get("filename") == "Unnamed.gd":
-                continue
-                
-            valid_pending_files.append(file_info)
-            
-        # If we fixed any files, update the pending files
-        if len(valid_pending_files) != len(pending_files):
-            logger.warning(f"Emergency filtering of pending files: {len(pending_files)} -> {len(valid_pending_files)}")
-            pending_files = valid_pending_files
-            
-        # Deduplicate pending files to prevent loops
-        if pending_files:
-            unique_pending_files = []
-            seen_filenames = set()
-            
-            for file_def in pending_files:
-                filename = file_def.get("filename", "")
-                if not filename:
-                    logger.error(f"Found pending file with missing filename: {file_def}")
-                    continue
-                    
-                norm_filename = FileDedupTracker.normalize_filename(filename)
-                if norm_filename not in seen_filenames:
-                    seen_filenames.add(norm_filename)
-                    unique_pending_files.append(file_def)
-            
-            # Check if this actually deduped anything
-            if len(unique_pending_files) < len(pending_files):
-                logger.info(f"Deduplicated pending files from {len(pending_files)} to {len(unique_pending_files)}")
-            
-            pending_files = unique_pending_files
-        
-        # Safety check: break infinite loops by limiting the number of pending files
-        # This is a guard against dependency explosion
+        # One sweep over the queue drops invalid entries, duplicates and files that are already written,
+        # caps its length against dependency explosion, and counts the files that still need a draft.
+        # Every queue this node writes back has been swept, and a file only completes after it has
+        # left the queue, so the sweep is needed only when dependencies were added or another node wrote the queue
         MAX_PENDING_FILES = 30
-        if len(pending_files) > MAX_PENDING_FILES:
-            logger.warning(f"Too many pending files ({len(pending_files)}), truncating to {MAX_PENDING_FILES}")
-            pending_files = pending_files[:MAX_PENDING_FILES]
+        drafts = state.get("drafts", {})
+        queued_count = len(queue)
         
-        # Process pending files
-        if pending_files:
-            # We need to find the next valid file to process
-            valid_file = None
-            remaining_files = []
+        if valid_dependencies or not state.get("pending_files_clean"):
+            known = FileDedupTracker.known_filenames(generated_code.keys(), [], processed_files)
+            unique_queue = deque()
+            seen_filenames = set()
+            invalid = duplicates = already_processed = truncated = undrafted = 0
             
-            # Look for a valid file in the pending list
-            for idx, file_info in enumerate(pending_files):
-                # Skip invalid entries
-                if not isinstance(file_info, dict):
-                    logger.error(f"Skipping invalid file entry that is not a dict: {file_info}")
+            for file_info in queue:
+                if not _is_valid_file_entry(file_info):
+                    invalid += 1
                     continue
-                    
-                filename = file_info.get("filename", "")
-                if not filename:
-                    logger.error(f"Skipping file with missing filename: {file_info}")
+                
+                norm_filename = FileDedupTracker.normalize_filename(file_info["filename"])
+                if norm_filename in seen_filenames:
+                    duplicates += 1
                     continue
+                seen_filenames.add(norm_filename)
                 
-                if filename == "Unnamed.gd":
-                    logger.error("Skipping unnamed file")
+                if norm_filename in known:
+                    already_processed += 1
                     continue
-                    
-                # Check if this file is already processed
-                if FileDedupTracker.is_duplicate_file(filename, list(generated_code.keys()), [], processed_files):
-                    logger.warning(f"Skipping already processed file: {filename}")
+                if len(unique_queue) == MAX_PENDING_FILES:
+                    truncated += 1
                     continue
-                    
-                # Found a valid file!
-                valid_file = file_info
-                remaining_files = pending_files[:idx] + pending_files[idx+1:]
-                break
                 
-            # If we found a valid file, process it
-            if valid_file:
-                logger.info(f"Processing next file: {valid_file['filename']}")
-                
-                # Update state and go to code writer
-                return Command(
-                    goto="code_writer",
-                    update={
-                        "current_file": valid_file,
-                        "pending_files": remaining_files,
-                        "processed_files": list(processed_files)
-                    }
-                )
-            else:
-                # No valid files found, go to scene setup
-                logger.warning("No valid files found in pending files, moving to scene setup")
-                return Command(
-                    goto="scene_setup",
-                    update={
-                        "processed_files": list(processed_files),
-                        "pending_files": []
-                    }
-                )
+                unique_queue.append(file_info)
+                if file_info["filename"] not in drafts:
+                    undrafted += 1
+            queue = unique_queue
+            
+            if invalid:
+                logger.warning("Emergency filtering of pending files: dropped %s invalid entries", invalid)
+            if duplicates:
+                logger.info("Deduplicated pending files, dropped %s duplicates", duplicates)
+            if already_processed:
+                logger.warning("Skipping %s already processed file(s)", already_processed)
+            if truncated:
+                logger.warning("Too many pending files, truncating to %s", MAX_PENDING_FILES)
         else:
-            # All files processed, move to scene setup
-            logger.info("All files processed, moving to scene setup")
+            undrafted = sum(1 for file_info in queue if file_info["filename"] not in drafts)
+        
+        # With the multi_file or message_batches strategies, draft all outstanding files up front
+        if undrafted > 1 and DRAFT_STRATEGY in ("multi_file", "message_batches"):
+            logger.info("Sending %s pending files to the batch code writer", undrafted)
             return Command(
-                goto="scene_setup",
+                goto="batch_code_writer",
                 update={
-                    "processed_files": list(processed_files),
-                    "pending_files": []
+                    **tracking,
+                    "pending_files": list(queue),
+                    "pending_files_clean": True
+                }
+            )
+        
+        # Fan a wave of files out to parallel writer/review branches; this node runs again
+        # once every branch of the wave has joined, and picks up all of their results at once
+        if len(queue) > 1:
+            wave = [queue.popleft() for _ in range(min(len(queue), MAX_CONCURRENT_CLAUDE_CALLS))]
+            logger.info("Writing %s files in parallel, %s left in the queue", len(wave), len(queue))
+            return Command(
+                goto=[FilePipelineNode.send(state, file_info) for file_info in wave],
+                update={
+                    **tracking,
+                    "pending_files": list(queue),
+                    "pending_files_clean": True
+                }
+            )
+        
+        # Process pending files
+        if queue:
+            valid_file = queue.popleft()
+            logger.info("Processing next file: %s", valid_file['filename'])
+            
+            # Update state and go to code writer
+            return Command(
+                goto="code_writer",
+                update={
+                    "current_file": valid_file,
+                    "pending_files": list(queue),
+                    "pending_files_clean": True,
+                    **tracking
                 }
             )
+        
+        if queued_count:
+            # No valid files found, go to scene setup
+            logger.warning("No valid files found in pending files, moving to scene setup")
+        else:
+            # All files processed, move to scene setup
+            logger.info("All files processed, moving to scene setup")
+        return Command(
+            goto="scene_setup",
+            update={
+                **tracking,
+                "pending_files": []
+            }
+        )
 
-    def _detect_dependencies(self, source_file: str, code: str, existing_files: List[str], 
+    def _detect_dependencies(self, completed: List[Tuple[str, str]], existing_files: Collection[str], 
                           processed_files: set, pending_files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Analyze generated code to detect potential dependencies on files that don't exist yet.
+        Completed files are analyzed in groups of up to DEPENDENCY_ANALYSIS_FILES_PER_REQUEST per Claude request.
         
         Args:
-            source_file: The file being analyzed
-            code: The source code to analyze
-            existing_files: List of files that are already planned or created
+            completed: (filename, code) pairs of the files being analyzed
+            existing_files: Files that are already planned or created (e.g. the generated_code keys view)
             processed_files: Set of filenames that have been processed already
             pending_files: List of files pending processing
 
         Returns:
             List of new file definitions that should be created
         """
+        prompts, new_dependencies = self._build_dependency_prompts(completed, existing_files, processed_files, pending_files)
+        for prompt, sources in prompts:
+            # Get descriptions of the missing dependencies
+            response = call_claude(prompt, max_tokens=DEPENDENCY_ANALYSIS_MAX_TOKENS * len(sources), temperature=0.0)
+            new_dependencies.extend(_remember_dependencies(completed, self._parse_dependency_response(sources, response)))
+        return self._merge_dependencies(new_dependencies, existing_files, processed_files, pending_files)
+
+    async def _adetect_dependencies(self, completed: List[Tuple[str, str]], existing_files: Collection[str], 
+                                    processed_files: set, pending_files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Async variant of _detect_dependencies; the per-group requests run concurrently in a TaskGroup."""
+        prompts, new_dependencies = self._build_dependency_prompts(completed, existing_files, processed_files, pending_files)
+        
+        async def analyze(prompt: str, sources: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+            response = await acall_claude(prompt, max_tokens=DEPENDENCY_ANALYSIS_MAX_TOKENS * len(sources), temperature=0.0)
+            return self._parse_dependency_response(sources, response)
+        
+        if prompts:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(analyze(prompt, sources)) for prompt, sources in prompts]
+            for task in tasks:
+                new_dependencies.extend(_remember_dependencies(completed, task.result()))
+        return self._merge_dependencies(new_dependencies, existing_files, processed_files, pending_files)
+
+    def _merge_dependencies(self, new_dependencies: List[Dict[str, Any]], existing_files: Collection[str],
+                            processed_files: set, pending_files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep only dependencies that aren't tracked yet, and drop ones defined for more than one source
+        (whether by separate requests or by earlier, cached analyses).
+        """
+        if not new_dependencies:
+            return []
+        unique_deps = FileDedupTracker.deduplicate_dependencies(new_dependencies, existing_files, pending_files, processed_files)
+        logger.info("%s of %s dependency definitions are new files", len(unique_deps), len(new_dependencies))
+        return unique_deps
+
+    def _build_dependency_prompts(self, completed: List[Tuple[str, str]], existing_files: Collection[str], 
+                                  processed_files: set, pending_files: List[Dict[str, Any]]
+                                  ) -> Tuple[List[Tuple[str, List[str]]], List[Dict[str, Any]]]:
+        """
+        Build the prompts asking Claude to define the missing dependencies of the completed files,
+        one per group of files. Returns (prompt, source files covered) pairs, plus the definitions
+        already known for files whose exact code was analyzed before.
+        """
+        # Normalized names of every file that is already generated, queued or processed,
+        # built once so each candidate is a single set lookup
+        known = FileDedupTracker.known_filenames(existing_files, pending_files, processed_files)
+        
+        queued = []  # (source_file, code, missing dependency names)
+        cached_dependencies = []
+        for source_file, code in completed:
+            cached = _cached_dependencies(source_file, code)
+            if cached is not None:
+                logger.info("Reusing earlier dependency analysis of %s", source_file)
+                cached_dependencies.extend(cached)
+                continue
+            missing = self._missing_dependencies(source_file, code, known)
+            if missing:
+                queued.append((source_file, code, missing))
+        
+        group_size = DEPENDENCY_ANALYSIS_FILES_PER_REQUEST
+        prompts = [self._build_dependency_prompt(queued[i:i + group_size]) for i in range(0, len(queued), group_size)]
+        return prompts, cached_dependencies
+
+    def _build_dependency_prompt(self, queued: List[Tuple[str, str, List[str]]]) -> Tuple[str, List[str]]:
+        """Build one prompt for a group of (source_file, code, missing names); several files share a multi-source prompt."""
+        if len(queued) == 1:
+            source_file, code, missing = queued[0]
+            prompt = _DEPENDENCY_PROMPT(
+                dependencies=', '.join(missing),
+                source_file=source_file,
+                code=_truncate_for_analysis(code)
+            )
+        else:
+            logger.info("Analyzing dependencies of %s files in one request", len(queued))
+            prompt = _DEPENDENCY_BATCH_PROMPT(sources="".join(
+                _DEPENDENCY_SOURCE_PROMPT(
+                    dependencies=', '.join(missing),
+                    source_file=source_file,
+                    code=_truncate_for_analysis(code)
+                )
+                for source_file, code, missing in queued
+            ))
+        return prompt, [source_file for source_file, _, _ in queued]
+
+    def _missing_dependencies(self, source_file: str, code: str, known: Set[str]) -> List[str]:
+        """Find names referenced in code that aren't Godot built-ins or known files."""
         # Safety check on inputs
         if not source_file or not code:
             logger.warning("Missing required inputs for dependency detection")
             return []
             
-        logger.info(f"Detecting dependencies in {source_file}")
-        new_dependencies = []
+        logger.info("Detecting dependencies in %s", source_file)
         
         try:
-            # Look for patterns that suggest dependencies on other files
-            # 1. Check for class references
-            class_references = re.findall(r'(?:var|const)\s+\w+\s*:\s*(\w+)', code)
-            # 2. Look for extends statements
-            extends_matches = re.findall(r'extends\s+(\w+)', code)
-            # 3. Look for preloads and loads
-            preload_matches = re.findall(r'preload\s*\(\s*["\']res://(?:scripts/)?(\w+\.gd)["\']', code)
-            load_matches = re.findall(r'load\s*\(\s*["\']res://(?:scripts/)?(\w+\.gd)["\']', code)
-            
-            # 4. Check for instantiate calls - new pattern to look for
-            instance_matches = re.findall(r'(\w+)\.new\(\)', code)
+            # Only scan the head of very large files; extends/preload/typed members cluster at the top
+            scan_code = code if not DEPENDENCY_SCAN_CHARS or len(code) <= DEPENDENCY_SCAN_CHARS else code[:DEPENDENCY_SCAN_CHARS]
             
-            # 5. Look for explicit requires comments
-            requires_matches = re.findall(r'#\s*requires\s*:\s*(\w+\.gd)', code)
-            
-            # Create a set of potential dependencies
-            potential_deps = set()
-            potential_deps.update(class_references)
-            potential_deps.update(extends_matches)
-            potential_deps.update([m.replace('.gd', '') for m in preload_matches])
-            potential_deps.update([m.replace('.gd', '') for m in load_matches])
-            potential_deps.update(instance_matches)
-            potential_deps.update([m.replace('.gd', '') for m in requires_matches])
+            # Collect potential dependencies in one pass (dict keeps first-seen order, so truncation below is stable)
+            potential_deps = {}
+            for match in _RE_DEPENDENCY.finditer(scan_code):
+                potential_deps[match.group(match.lastgroup)] = None
             
             # Filter out basic Godot types and already processed files
             filtered_deps = []
             for dep in potential_deps:
-                dep_filename = f"{dep}.gd"
-                if not dep.startswith("_") and not dep in BASIC_GODOT_TYPES:
-                    # Use the deduplication helper
-                    if not FileDedupTracker.is_duplicate_file(dep_filename, existing_files, pending_files, processed_files):
-                        filtered_deps.append(dep)
+                if dep.startswith("_") or dep in BASIC_GODOT_TYPES or dep == "Unnamed":
+                    continue
+                if FileDedupTracker.normalize_filename(f"{dep}.gd") not in known:
+                    filtered_deps.append(dep)
             
             # Limit number of dependencies to prevent explosion
             MAX_DEPENDENCIES = 3
             if len(filtered_deps) > MAX_DEPENDENCIES:
-                logger.warning(f"Too many dependencies detected ({len(filtered_deps)}), limiting to {MAX_DEPENDENCIES}")
+                logger.warning("Too many dependencies detected (%s), limiting to %s", len(filtered_deps), MAX_DEPENDENCIES)
                 filtered_deps = filtered_deps[:MAX_DEPENDENCIES]
             
-            if filtered_deps:
-                # For each missing dependency, create a file definition
-                prompt = PROMPTS["dependency_analysis"].format(
-                    dependencies=', '.join(filtered_deps),
-                    source_file=source_file,
-                    code=code[:500]  # Truncate code to first 500 chars
-                )
+            return filtered_deps
+        except Exception as e:
+            logger.error("Error in dependency detection: %s", e)
+            return []
+
+    def _parse_dependency_response(self, sources: List[str], response: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Turn Claude's JSON dependency definitions into validated file definitions per source file.
+        A single source gets a JSON array back; several get an object keyed by source filename.
+        Sources missing from the result had no usable response and shouldn't be cached.
+        """
+        try:
+            if len(sources) == 1:
+                dep_definitions = json_utils.extract_json_array(response)
+                definitions_by_source = {sources[0]: dep_definitions} if dep_definitions is not None else None
+            else:
+                definitions_by_source = json_utils.extract_json_object(response)
+            
+            if definitions_by_source is None:
+                logger.error("Failed to generate valid dependency definitions for %s", ', '.join(sources))
+                return {}
+            
+            # Validate dependency definitions before returning
+            validated = {}
+            for source_file in sources:
+                dep_definitions = definitions_by_source.get(source_file)
+                if dep_definitions is None:
+                    logger.warning("No dependency definitions returned for %s", source_file)
+                    continue
+                if not isinstance(dep_definitions, list):
+                    logger.error("Skipping malformed dependency definitions for %s", source_file)
+                    continue
                 
-                try:
-                    # Get descriptions of the missing dependencies
-                    response = call_claude(prompt)
-                    json_match = re.search(r'\[[\s\S]*\]', response)
-                    
-                    if not json_match:
-                        logger.error(f"Failed to generate valid dependency definitions for {source_file}")
-                        return []
+                validated_deps = []
+                for dep in dep_definitions:
+                    if not isinstance(dep, dict):
+                        logger.error("Skipping non-dict dependency: %s", dep)
+                        continue
                         
-                    dep_definitions = json.loads(json_match.group(0))
-                    
-                    # Validate dependency definitions before returning
-                    validated_deps = []
-                    for dep in dep_definitions:
-                        if not isinstance(dep, dict):
-                            logger.error(f"Skipping non-dict dependency: {dep}")
-                            continue
-                            
-                        if not dep.get("filename"):
-                            logger.error(f"Skipping dependency with missing filename from {source_file}")
-                            continue
-                            
-                        if dep.get("filename") == "Unnamed.gd":
-                            logger.error(f"Skipping unnamed dependency from {source_file}")
-                            continue
-                            
-                        validated_deps.append(dep)
+                    if not dep.get("filename"):
+                        logger.error("Skipping dependency with missing filename from %s", source_file)
+                        continue
                         
-                    logger.info(f"Created definitions for {len(validated_deps)} new dependency files")
-                    
-                    # Filter to make sure we're only adding new files using our deduplication helper
-                    new_dependencies = FileDedupTracker.deduplicate_dependencies(
-                        validated_deps, existing_files, pending_files, processed_files
-                    )
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse dependency JSON: {e}")
-                    return []
-        except Exception as e:
-            logger.error(f"Error in dependency detection: {str(e)}")
-            return []
+                    if dep.get("filename") == "Unnamed.gd":
+                        logger.error("Skipping unnamed dependency from %s", source_file)
+                        continue
+                        
+                    validated_deps.append(dep)
+                validated[source_file] = validated_deps
                 
-        return new_dependencies
+            logger.info("Created definitions for %s new dependency files", sum(map(len, validated.values())))
+            return validated
+        except Exception as e:
+            logger.error("Error in dependency detection: %s", e)
+            return {}
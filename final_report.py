@@ -1,29 +1,17 @@
+import os
+import logging
 from typing import Dict, Any, Literal
 from langgraph.graph import StateGraph, START
 from langgraph.types import Command
 
 from state import GodotState
 
-class FinalReportNode:
-    """
-    Generates a final report with all generated code, setup instructions, and next steps.
-    """
-    def __init__(self, name: str):
-        self.name = name
-        
-    def __call__(self, state: GodotState):
-        """Make node callable for LangGraph"""
-        return self.invoke(state)
+logger = logging.getLogger(__name__)
 
-    def invoke(self, state: GodotState) -> Command[Literal["__end__"]]:
-        instructions = state.get("instructions", {})
-        code_dict = state.get("generated_code", {})
-        scene_guide = state.get("scene_guide", "")
-        
-        game_premise = instructions.get("game_premise", "Factorio-Nexus Wars hybrid game")
-        
-        # Generate a comprehensive report
-        report = f"""
+REPORT_FILENAME = "godot_prototype_report.md"
+
+# Static report sections, defined once at import instead of rebuilt as f-strings on every call
+_REPORT_HEADER = """
 # Godot Prototype Generation Report
 
 ## Game Premise
@@ -32,13 +20,8 @@ class FinalReportNode:
 ## Generated GDScript Files
 
 """
-        
-        # Add each generated script with proper markdown formatting
-        for filename, code in code_dict.items():
-            report += f"### {filename}\n```gdscript\n{code}\n```\n\n"
-        
-        # Add scene setup guide
-        report += f"""
+
+_REPORT_FOOTER = """
 ## Scene Setup Guide
 {scene_guide}
 
@@ -73,5 +56,47 @@ class FinalReportNode:
 - Signals are used for component communication
 - Code is organized to facilitate future expansion
 """
+
+class FinalReportNode:
+    """
+    Generates a final report with all generated code, setup instructions, and next steps.
+    """
+    def __init__(self, name: str):
+        self.name = name
         
+    def __call__(self, state: GodotState):
+        """Make node callable for LangGraph"""
+        return self.invoke(state)
+
+    def invoke(self, state: GodotState) -> Command[Literal["__end__"]]:
+        instructions = state.get("instructions", {})
+        code_dict = state.get("generated_code", {})
+        scene_guide = state.get("scene_guide", "")
+        run_folder = state.get("run_folder")
+        
+        game_premise = instructions.get("game_premise", "Factorio-Nexus Wars hybrid game")
+        
+        # With a run folder the report goes straight to disk, one section at a time, and only its
+        # path is kept in state, so the full text of every script isn't copied into each checkpoint
+        if run_folder:
+            report_path = os.path.join(run_folder, REPORT_FILENAME)
+            try:
+                with open(report_path, "w", encoding="utf-8") as f:
+                    for part in self._report_parts(game_premise, code_dict, scene_guide):
+                        f.write(part)
+                logger.info(f"Wrote final report to {report_path}")
+                return Command(goto="__end__", update={"final_report_path": report_path})
+            except OSError as e:
+                logger.error(f"Failed to write final report, keeping it in state instead: {str(e)}")
+        
+        report = "".join(self._report_parts(game_premise, code_dict, scene_guide))
         return Command(goto="__end__", update={"final_report": report})
+
+    def _report_parts(self, game_premise: str, code_dict: Dict[str, str], scene_guide: str):
+        """Yield the report in order: header, each generated script as a markdown code block, then the footer."""
+        yield _REPORT_HEADER.format(game_premise=game_premise)
+        for filename, code in code_dict.items():
+            yield f"### {filename}\n```gdscript\n"
+            yield code
+            yield "\n```\n\n"
+        yield _REPORT_FOOTER.format(scene_guide=scene_guide)
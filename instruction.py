@@ -13,6 +13,14 @@ from config import (
 
 logger = logging.getLogger(__name__)
 
+# Everything but the premise is fixed config, so build that part once
+_STATIC_INSTRUCTION_BASE = {
+    "coding_best_practices": CODING_BEST_PRACTICES,
+    "project_structure": PROJECT_STRUCTURE,
+    "design_constraints": DESIGN_CONSTRAINTS,
+    "key_mechanics": KEY_MECHANICS
+}
+
 class InstructionNode:
     """
     Node responsible for holding the initial instructions,
@@ -20,7 +28,7 @@ class InstructionNode:
     """
     def __init__(self, name: str):
         self.name = name
-        logger.info(f"InstructionNode initialized: {name}")
+        logger.info("InstructionNode initialized: %s", name)
 
     def __call__(self, state: GodotState):
         """Make node callable for LangGraph"""
@@ -30,15 +38,9 @@ class InstructionNode:
         # Get the game premise from the input context
         game_premise = state.get("instructions", {}).get("game_premise", "")
         
-        instructions = {
-            "game_premise": game_premise,
-            "coding_best_practices": CODING_BEST_PRACTICES,
-            "project_structure": PROJECT_STRUCTURE,
-            "design_constraints": DESIGN_CONSTRAINTS,
-            "key_mechanics": KEY_MECHANICS
-        }
+        instructions = {"game_premise": game_premise, **_STATIC_INSTRUCTION_BASE}
         
-        logger.info(f"Processed game premise: {game_premise[:50]}...")
+        logger.info("Processed game premise: %.50s...", game_premise)
         # Return updated state with the instructions
         return Command(
             update={"instructions": instructions},
@@ -0,0 +1,73 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    logger.debug("orjson is not installed, using the standard json module")
+
+def loads(text: Union[str, bytes]) -> Any:
+    """
+    Parse JSON from a Claude response, with orjson when it is installed.
+    Malformed input raises json.JSONDecodeError either way (orjson's error subclasses it).
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Encode obj as UTF-8 JSON bytes, with orjson when it is installed. Non-string dict keys are
+    converted like the json module does; pretty indents by two spaces.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if pretty else None, ensure_ascii=False).encode("utf-8")
+
+def extract_json_array(text: str) -> Optional[List[Any]]:
+    """
+    Parse the first valid top-level JSON array embedded in text (e.g. a Claude response with prose around it).
+    Returns None when there is none.
+    """
+    return _extract_json(text, "[", list)
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Parse the first valid top-level JSON object embedded in text, or return None."""
+    return _extract_json(text, "{", dict)
+
+_DECODER = json.JSONDecoder()
+
+def _extract_json(text: str, opener: str, expected_type: type) -> Any:
+    """
+    Decode JSON with raw_decode starting at each opener in turn; the C scanner reads one value
+    left to right and stops at its closing bracket, so trailing prose is never touched. When a
+    spot doesn't decode (say an "[x]" checkbox in prose), the search resumes where decoding failed:
+    openers before that point are nested inside the broken value, so a truncated response yields
+    None rather than one of its inner lists, and the text is still only scanned once.
+    """
+    # The prompts ask for bare JSON, so first try the whole response as one document
+    stripped = text.strip()
+    if stripped.startswith(opener):
+        try:
+            value = loads(stripped)
+            if isinstance(value, expected_type):
+                return value
+        except ValueError:
+            pass
+
+    start = text.find(opener)
+    while start >= 0:
+        try:
+            value, end = _DECODER.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            start = text.find(opener, max(e.pos, start + 1))
+            continue
+        if isinstance(value, expected_type):
+            return value
+        start = text.find(opener, end)
+    return None
@@ -0,0 +1,311 @@
+import os
+import re
+import json
+import time
+import atexit
+import string
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Pattern
+
+from config import (
+    CLAUDE_CACHE_MAX_MB,
+    LLM_CACHE_DIRECTORY,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_TTL_DAYS,
+    PROMPTS,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MODEL,
+    SEMANTIC_CACHE_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """
+    Exact-match on-disk cache of Claude responses, keyed by a SHA-256 hash of the request,
+    with a small in-memory LRU in front so repeats within a run skip the file read.
+    Entries are sharded into subdirectories by the first two hex digits of the key, and the
+    least recently used ones are evicted once the cache grows past max_mb. A file's mtime is
+    when it was written (checked against ttl_days), its atime when it was last read (used for eviction).
+    Set CLAUDE_CACHE=off to bypass it.
+    """
+    def __init__(self, directory: str = LLM_CACHE_DIRECTORY, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 max_mb: float = CLAUDE_CACHE_MAX_MB, ttl_days: float = LLM_CACHE_TTL_DAYS):
+        self.directory = directory
+        self.enabled = os.environ.get("CLAUDE_CACHE", "on").lower() != "off"
+        self.memory_entries = memory_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_days * 86400
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None  # Measured on the first write
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(**request: Any) -> str:
+        """Hash the request parameters (model, max_tokens, prompt, ...) into a cache key."""
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        with self._memory_lock:
+            response = self._memory.get(key)
+            if response is not None:
+                self._memory.move_to_end(key)
+        
+        if response is None:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    written_at = os.fstat(f.fileno()).st_mtime
+                    if self.ttl_seconds and time.time() - written_at > self.ttl_seconds:
+                        logger.info(f"LLM cache entry {key[:12]} has expired")
+                        self.misses += 1
+                        return None
+                    response = f.read()
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self._remember(key, response)
+            self._touch(path, written_at)
+
+        self.hits += 1
+        logger.info(f"LLM cache hit for {key[:12]}")
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response; written to a temp file first so concurrent writers never leave partial entries."""
+        if not self.enabled:
+            return
+
+        self._remember(key, response)
+        try:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(response)
+            os.replace(tmp_path, path)
+            self._account(os.path.getsize(path))
+        except OSError as e:
+            logger.error(f"Failed to write LLM cache entry: {str(e)}")
+
+    def get_batch_id(self, key: str) -> Optional[str]:
+        """Return the Message Batches id submitted for this set of requests, if one is still in flight."""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._batch_path(key), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_batch_id(self, key: str, batch_id: str) -> None:
+        """Remember a submitted batch so an interrupted run can resume polling it instead of resubmitting."""
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._batch_path(key)), exist_ok=True)
+            with open(self._batch_path(key), "w", encoding="utf-8") as f:
+                f.write(batch_id)
+        except OSError as e:
+            logger.error(f"Failed to record batch id: {str(e)}")
+
+    def clear_batch_id(self, key: str) -> None:
+        try:
+            os.remove(self._batch_path(key))
+        except OSError:
+            pass
+
+    def log_stats(self) -> None:
+        """Log hit/miss counters for this process."""
+        if self.hits or self.misses:
+            logger.info(f"LLM cache: {self.hits} hit(s), {self.misses} miss(es)")
+
+    def _remember(self, key: str, response: str) -> None:
+        """Keep a response in the in-memory LRU, evicting the least recently used entry when full."""
+        with self._memory_lock:
+            self._memory[key] = response
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _touch(self, path: str, written_at: float) -> None:
+        """Mark a disk entry as recently used by setting its atime, keeping the mtime the TTL is measured from."""
+        try:
+            os.utime(path, (time.time(), written_at))
+        except OSError:
+            pass
+
+    def _account(self, added_bytes: int) -> None:
+        """Track the size of the cache on disk and evict old entries once it passes max_bytes."""
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(entry.stat().st_size for entry in self._entries())
+            else:
+                self._disk_bytes += added_bytes
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache is back under 90% of max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_atime)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for entry in entries:
+            if self._disk_bytes <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            removed += 1
+        logger.info(f"Evicted {removed} LLM cache entries ({self._disk_bytes // 1024} KB left)")
+
+    def _entries(self):
+        """Every response file in the shard directories."""
+        try:
+            shards = [entry for entry in os.scandir(self.directory) if entry.is_dir() and len(entry.name) == 2]
+        except FileNotFoundError:
+            return []
+        return [entry for shard in shards for entry in os.scandir(shard.path) if entry.name.endswith(".txt")]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def _batch_path(self, key: str) -> str:
+        return os.path.join(self.directory, "batches", f"{key}.id")
+
+class SemanticCache:
+    """
+    Similarity cache for prompts that differ only in small details (e.g. filename or purpose).
+    Only the values substituted into a PROMPTS template are embedded, so the shared boilerplate
+    doesn't dominate the similarity score. A cached response is reused when the cosine similarity
+    of the embeddings is at least SEMANTIC_CACHE_THRESHOLD.
+    
+    Requires sentence-transformers and numpy; enable with SEMANTIC_CACHE_ENABLED or CLAUDE_SEMANTIC_CACHE=on.
+    """
+    def __init__(self, directory: str = LLM_CACHE_DIRECTORY, model_name: str = SEMANTIC_CACHE_MODEL,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        setting = os.environ.get("CLAUDE_SEMANTIC_CACHE")
+        self.enabled = setting.lower() == "on" if setting else SEMANTIC_CACHE_ENABLED
+        self.path = os.path.join(directory, "semantic_index.json")
+        self.model_name = model_name
+        self.threshold = threshold
+        self._model = None
+        self._index: Dict[str, Dict[str, Any]] = {}  # namespace -> {"vectors": ndarray, "responses": [...]}
+        self._lock = threading.Lock()
+        self._templates = _compile_templates(PROMPTS)
+
+    def get(self, namespace: str, prompt: str) -> Optional[str]:
+        """Return the response of the most similar cached prompt in namespace, if it is close enough."""
+        if not self.enabled or not self._ensure_loaded():
+            return None
+
+        vector = self._embed(prompt)
+        with self._lock:
+            entry = self._index.get(namespace)
+            if not entry or not entry["responses"]:
+                return None
+            scores = entry["vectors"] @ vector
+            best = int(scores.argmax())
+            if scores[best] < self.threshold:
+                return None
+            logger.info(f"Semantic cache hit (similarity {scores[best]:.3f})")
+            return entry["responses"][best]
+
+    def set(self, namespace: str, prompt: str, response: str) -> None:
+        """Add a prompt/response pair to the index and persist it."""
+        if not self.enabled or not self._ensure_loaded():
+            return
+
+        import numpy as np
+
+        vector = self._embed(prompt)
+        with self._lock:
+            entry = self._index.setdefault(namespace, {"vectors": np.empty((0, vector.shape[0])), "responses": []})
+            entry["vectors"] = np.vstack([entry["vectors"], vector])
+            entry["responses"].append(response)
+            self._save()
+
+    def _ensure_loaded(self) -> bool:
+        """Lazily load the embedding model and the persisted index."""
+        if self._model is not None:
+            return True
+
+        with self._lock:
+            if self._model is not None:
+                return True
+            try:
+                import numpy as np
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                logger.warning("sentence-transformers is not installed. Semantic cache disabled.")
+                self.enabled = False
+                return False
+
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        stored = json.load(f)
+                    self._index = {
+                        namespace: {"vectors": np.array(entry["vectors"]), "responses": entry["responses"]}
+                        for namespace, entry in stored.items()
+                    }
+                except (OSError, ValueError) as e:
+                    logger.error(f"Failed to load semantic cache index: {str(e)}")
+
+            self._model = SentenceTransformer(self.model_name)
+        return True
+
+    def _embed(self, prompt: str):
+        """Embed the template-free part of a prompt as a unit vector."""
+        return self._model.encode(_prompt_delta(prompt, self._templates), normalize_embeddings=True)
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            stored = {
+                namespace: {"vectors": entry["vectors"].tolist(), "responses": entry["responses"]}
+                for namespace, entry in self._index.items()
+            }
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(stored, f, ensure_ascii=False)
+        except OSError as e:
+            logger.error(f"Failed to write semantic cache index: {str(e)}")
+
+def _compile_templates(prompts: Dict[str, str]) -> Dict[str, Pattern]:
+    """Turn each PROMPTS template into a regex that captures the substituted values."""
+    patterns = {}
+    for name, template in prompts.items():
+        parts = []
+        for literal, field, _, _ in string.Formatter().parse(template):
+            parts.append(re.escape(literal))
+            if field is not None:
+                parts.append(r"(.*?)")
+        patterns[name] = re.compile("".join(parts), re.DOTALL)
+    return patterns
+
+def _prompt_delta(prompt: str, templates: Dict[str, Pattern]) -> str:
+    """Strip template boilerplate from a prompt, keeping only the values that were filled in."""
+    for name, pattern in templates.items():
+        match = pattern.fullmatch(prompt)
+        if match:
+            return "\n".join([name, *match.groups()])
+    return prompt
+
+# Shared caches used by claude_api
+llm_cache = LLMCache()
+semantic_cache = SemanticCache()
+atexit.register(llm_cache.log_stats)
@@ -1,43 +1,44 @@
+import asyncio
 import logging
+import logging.handlers
 import os
 import sys
 import traceback
-from typing import Any, Dict, Optional
+from typing import Any, Dict
 
-from langgraph.graph import StateGraph, START, END
-from langgraph.types import Command
-from langgraph.channels.last_value import LastValue  # Fixed import path
-
-# Import our nodes
-from instruction import InstructionNode
-from supervisor import SupervisorNode
-from scene_setup import SceneSetupNode
-from final_report import FinalReportNode
-from code_writer import CodeWriterNode
-from code_review import CodeReviewNode
-from file_processor import FileProcessorNode
-from state import GodotState
 from config import CORE_GAME_DESCRIPTION
-from run_utils import (
-    generate_run_id, 
-    create_run_folder, 
-    save_state_snapshot, 
-    save_node_io,
-    save_final_state
-)
 
-# Configure logging
+# LangGraph and the node modules (which pull in the Anthropic SDK) are imported where they are
+# first needed, in build_graph() and main(), so importing this module stays cheap
+
+# Configure logging; the log file is written in batches of records (immediately for errors)
+# rather than with a write and flush per record
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_log_file_handler = logging.FileHandler("gdscript_generator.log", delay=True)
+_log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     handlers=[
         logging.StreamHandler(sys.stdout),
-        logging.FileHandler("gdscript_generator.log")
+        logging.handlers.MemoryHandler(capacity=1024, flushLevel=logging.ERROR, target=_log_file_handler)
     ]
 )
 logger = logging.getLogger(__name__)
 
 def build_graph():
+    from langgraph.graph import StateGraph, START, END
+    from instruction import InstructionNode
+    from supervisor import SupervisorNode
+    from scene_setup import SceneSetupNode
+    from final_report import FinalReportNode
+    from code_writer import CodeWriterNode
+    from batch_code_writer import BatchCodeWriterNode
+    from code_review import CodeReviewNode
+    from file_processor import FileProcessorNode
+    from file_pipeline import FilePipelineNode
+    from state import GodotState
+    
     logger.info("Building LangGraph for Godot prototype generation")
     
     # Initialize the StateGraph with our state definition
@@ -47,8 +48,10 @@ def build_graph():
     instruction_node = InstructionNode("instruction")
     supervisor_node = SupervisorNode("supervisor", max_iterations=3)
     code_writer_node = CodeWriterNode("code_writer")
+    batch_code_writer_node = BatchCodeWriterNode("batch_code_writer")
     code_review_node = CodeReviewNode("code_review", max_iterations=1)  # Explicitly set to 1 revision
     file_processor_node = FileProcessorNode("file_processor")
+    file_pipeline_node = FilePipelineNode("file_pipeline", code_writer_node, code_review_node)
     scene_setup_node = SceneSetupNode("scene_setup")
     final_report_node = FinalReportNode("final_report_node")
     
@@ -56,8 +59,10 @@ def build_graph():
     graph.add_node("instruction", instruction_node)
     graph.add_node("supervisor", supervisor_node)
     graph.add_node("code_writer", code_writer_node)
+    graph.add_node("batch_code_writer", batch_code_writer_node)
     graph.add_node("code_review", code_review_node)
     graph.add_node("file_processor", file_processor_node)
+    graph.add_node("file_pipeline", file_pipeline_node)
     graph.add_node("scene_setup", scene_setup_node)
     graph.add_node("final_report_node", final_report_node)
     
@@ -66,36 +71,15 @@ def build_graph():
     graph.add_edge(START, "instruction")
     graph.add_edge("instruction", "supervisor")
     
-    # Code generation flow
-    graph.add_edge("supervisor", "code_writer")
+    # Code generation flow: the supervisor queues the planned files and routes via Command to the
+    # file processor, which fans waves of them out to parallel file_pipeline branches (Send) or
+    # hands a single file to the code writer
     graph.add_edge("code_writer", "code_review")
     
-    # Conditional flows from code review
-    graph.add_conditional_edges(
-        "code_review",
-        # Function to route based on code review result
-        # Fixed to handle None values properly
-        lambda state: "code_writer" if state.get("review_status", {}).get(
-            state.get("current_file", {}).get("filename", "") if state.get("current_file") else ""
-        ) == "needs_revision" else "file_processor"
-    )
-    
-    # File processor conditional edges
-    graph.add_conditional_edges(
-        "file_processor",
-        # Function to route based on whether there are pending files
-        lambda state: "code_writer" if state.get("pending_files") 
-            else "scene_setup"
-    )
-    
-    # Supervisor can also go directly to scene setup if no files to generate
-    graph.add_conditional_edges(
-        "supervisor",
-        # Function to determine if we should skip code generation
-        lambda state: "scene_setup" if not state.get("pending_files", []) 
-            and not state.get("current_file") 
-            else "code_writer"
-    )
+    # Code review and the file processor route themselves via Command (code review back to the code writer
+    # or on to the file processor; the file processor to code_writer, file_pipeline, batch_code_writer or
+    # scene_setup); a conditional edge on either would fire a second target alongside the Command's
+    graph.add_edge("batch_code_writer", "file_processor")
     
     # Final stages
     graph.add_edge("scene_setup", "final_report_node")
@@ -104,36 +88,64 @@ def build_graph():
     logger.info("Graph built successfully with all nodes and connections")
     return graph.compile()
 
+# Run settings shared by every execution of the graph
+GRAPH_CONFIG = {"recursion_limit": 500}
+
+_compiled_graph = None
+
+def get_graph():
+    """Build and compile the graph on first use; every later run in the process reuses it."""
+    global _compiled_graph
+    if _compiled_graph is None:
+        _compiled_graph = build_graph()
+    return _compiled_graph
+
+async def run_once(initial_state: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the compiled graph once on initial_state and return the final state (no run folder output)."""
+    return await get_graph().ainvoke(initial_state, GRAPH_CONFIG)
+
 
 def save_generated_code(code_dict, run_folder, output_subdir="generated_code"):
     """Save generated code files to disk."""
     output_dir = os.path.join(run_folder, output_subdir)
-    os.makedirs(output_dir, exist_ok=True)
+    file_paths = {filename: os.path.join(output_dir, filename) for filename in code_dict}
+    
+    # Create each directory once (filenames may include subfolders) instead of once per file
+    for directory in {output_dir, *(os.path.dirname(path) for path in file_paths.values())}:
+        os.makedirs(directory, exist_ok=True)
     
     for filename, code in code_dict.items():
-        file_path = os.path.join(output_dir, filename)
-        logger.info(f"Saving file: {file_path}")
-        # Ensure the directory exists for the file
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
+        logger.debug("Saving file: %s", file_paths[filename])
+        with open(file_paths[filename], "w", encoding="utf-8", buffering=65536) as f:
             f.write(code)
     
     logger.info(f"Saved {len(code_dict)} files to {output_dir}/")
     return output_dir
 
 
-if __name__ == "__main__":
+async def main():
+    from langgraph.graph import END
+    from final_report import REPORT_FILENAME
+    from run_utils import (
+        generate_run_id, 
+        create_run_folder, 
+        save_state_snapshot, 
+        save_node_io,
+        save_final_state,
+        snapshot_writer
+    )
+    
     # Generate a unique run ID and create a folder for this run
     run_id = generate_run_id()
     run_folder = create_run_folder(run_id)
-    logger.info(f"Starting Godot prototype generation process with run ID: {run_id}")
+    logger.info("Starting Godot prototype generation process with run ID: %s", run_id)
     
     try:
-        graph = build_graph()
+        graph = get_graph()
         
         # Get user input for game concepts
         game_description = CORE_GAME_DESCRIPTION
-        logger.info(f"Received game description: {game_description[:50]}...")
+        logger.info("Received game description: %s...", game_description[:50])
         
         # Initialize state with user input and empty messages list
         initial_state = {
@@ -146,14 +158,15 @@ if __name__ == "__main__":
         # Save the initial state
         save_state_snapshot(initial_state, run_folder, "initial")
         
-        # Stream the graph execution to see progress
+        # Stream the graph execution to see progress (async so nodes can fan out Claude calls)
         logger.info("Running generation graph...")
         result = None
         last_state = initial_state
-        for step in graph.stream(initial_state, { "recursion_limit": 500 }):
+        generated_code = {}  # Collected from every step's update; the final step doesn't carry it
+        async for step in graph.astream(initial_state, GRAPH_CONFIG):
             # Get current node name
             current_node = list(step.keys())[0] if step and END not in step else "END"
-            logger.info(f"Executing node: {current_node}")
+            logger.info("Executing node: %s", current_node)
             
             if current_node != "END":
                 # Save the state after each step
@@ -164,31 +177,29 @@ if __name__ == "__main__":
                     save_node_io(run_folder, current_node, last_state, step[current_node])
                 
                 last_state = step[current_node]
+                if isinstance(last_state, dict) and last_state.get("generated_code"):
+                    generated_code.update(last_state["generated_code"])
             
             result = step
         
         if result:
-            # Get the final report from the result
-            final_output = result.get("final_report", {}).get("final_report", "No report found.")
+            # The report node writes the report into the run folder; older states carry the text instead
+            report_output = result.get("final_report_node", {})
             logger.info("Generation complete!")
             print("\nGeneration complete! Summary of results:")
             print("----------------------------------------")
             
-            generated_code = {}
-            for key, value in result.items():
-                if isinstance(value, dict) and "generated_code" in value:
-                    generated_code = value["generated_code"]
-                    break
-                    
             print(f"Generated {len(generated_code)} GDScript files")
             
             # Save the final state
             save_final_state(last_state, run_folder, "complete")
             
             # Save results to files
-            report_path = os.path.join(run_folder, "godot_prototype_report.md")
-            with open(report_path, "w", encoding="utf-8") as f:
-                f.write(final_output)
+            report_path = report_output.get("final_report_path")
+            if not report_path:
+                report_path = os.path.join(run_folder, REPORT_FILENAME)
+                with open(report_path, "w", encoding="utf-8") as f:
+                    f.write(report_output.get("final_report", "No report found."))
             
             # Save the actual code files to the run folder
             output_dir = save_generated_code(generated_code, run_folder)
@@ -210,3 +221,10 @@ if __name__ == "__main__":
         # Save the state at the time of failure
         if 'last_state' in locals():
             save_final_state(last_state, run_folder, "error")
+    finally:
+        # Snapshots are written on a daemon thread; make sure they all land before exiting
+        snapshot_writer.flush()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
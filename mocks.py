@@ -0,0 +1,54 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Filename mentioned in a code writer prompt
+_FN_RE = re.compile(r'GDScript file named [\'"]([^\'"]+)[\'"]')
+
+def generate_mock_response(prompt: str) -> str:
+    """
+    Generate a mock response when Claude API is not available.
+    This is a simple implementation that just returns placeholder GDScript.
+    
+    Args:
+        prompt: The original prompt that would have been sent to Claude
+        
+    Returns:
+        A mock response with basic GDScript code
+    """
+    logger.warning("Using mock response - NO REAL CLAUDE API IS BEING CALLED")
+    
+    # Extract filename from the prompt if possible
+    filename_match = _FN_RE.search(prompt)
+    filename = filename_match.group(1) if filename_match else "Unknown.gd"
+    
+    # Create a very basic GDScript file based on the filename
+    class_name = filename.replace(".gd", "").capitalize()
+    
+    mock_script = f"""
+extends Node
+
+class_name {class_name}
+
+# This is a mock script created when Claude API was unavailable
+# You should replace this with actual implementation
+
+var name: String = "{class_name}"
+var active: bool = true
+
+func _ready() -> void:
+    print("{class_name} initialized")
+    
+func get_name() -> String:
+    return name
+    
+func is_active() -> bool:
+    return active
+    
+func set_active(value: bool) -> void:
+    active = value
+    
+# NOTE: This is a mock implementation - please implement real functionality
+"""
+    return mock_script
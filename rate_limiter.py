@@ -0,0 +1,76 @@
+import time
+import asyncio
+import logging
+import threading
+
+from config import CLAUDE_RPM, CLAUDE_TPM
+
+logger = logging.getLogger(__name__)
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets shared by every Claude call, so
+    concurrent callers wait just long enough to stay under the account's rate limits instead
+    of running into 429s and retry backoff. A limit of 0 disables that bucket.
+    """
+    def __init__(self, rpm: int = CLAUDE_RPM, tpm: int = CLAUDE_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        """Block until a request slot and the estimated tokens are available, then take them."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        """Async variant of acquire; waits without blocking the event loop."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def record(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once a request's real usage is known (it may go into debt)."""
+        if not self.tpm:
+            return
+        with self._lock:
+            self._tokens -= actual - estimated
+
+    def _reserve(self, tokens: int) -> float:
+        """Take a request slot and tokens if both buckets have them, otherwise return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            if self.rpm:
+                self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+            if self.tpm:
+                self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+                tokens = min(tokens, self.tpm)  # A request bigger than the bucket waits for a full one
+
+            wait = 0.0
+            if self.rpm and self._requests < 1:
+                wait = (1 - self._requests) * 60 / self.rpm
+            if self.tpm and self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+            if wait > 0:
+                return wait
+
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+            return 0.0
+
+# Shared limiter used by claude_api
+claude_rate_limiter = TokenBucketLimiter()
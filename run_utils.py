@@ -1,12 +1,44 @@
 import os
 import uuid
 import json
+import queue
+import hashlib
 import datetime
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+from collections import Counter
+from typing import BinaryIO, Callable, Dict, Any, Optional, List, Set, Tuple, get_type_hints
+
+import json_utils
+from state import GodotState, dict_merge_reducer
 
 logger = logging.getLogger(__name__)
 
+# State keys whose updates merge into the existing dict; their snapshots are diffed entry by entry
+_MERGED_KEYS = frozenset(
+    key for key, hint in get_type_hints(GodotState, include_extras=True).items()
+    if dict_merge_reducer in getattr(hint, "__metadata__", ())
+)
+
+# Per run folder, the object last snapshotted for each state key (or merged dict entry); nodes return new
+# objects for the values they change, so anything still identical is known to be unchanged without encoding it
+_last_snapshots: Dict[str, Dict[Tuple[str, ...], Any]] = {}
+
+# Per run folder, the content hashes of generated code already written to blobs/; only used on the writer thread
+_written_blobs: Dict[str, Set[str]] = {}
+
+# Per run folder, the open overview.jsonl and its step count; only used on the writer thread
+_overview_files: Dict[str, BinaryIO] = {}
+_overview_steps: Dict[str, int] = {}
+
+# Per (run folder, kind of file), the number of files written so far: state snapshots and node I/O pairs
+# are numbered so repeated (or parallel) steps of the same node never overwrite each other
+_file_numbers: Counter = Counter()
+
+def _next_file_number(run_folder: str, kind: str) -> int:
+    _file_numbers[run_folder, kind] += 1
+    return _file_numbers[run_folder, kind]
+
 def generate_run_id() -> str:
     """Generate a unique run ID with timestamp prefix"""
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -20,21 +52,143 @@ def create_run_folder(run_id: str, base_dir: str = "runs") -> str:
     logger.info(f"Created run folder: {run_folder}")
     return run_folder
 
+class SnapshotWriter:
+    """
+    Writes run files (state snapshots, node I/O, the overview) on a daemon thread, in submission
+    order, so the graph loop never waits on serialization or disk. Call flush() before reading
+    the files back or exiting.
+    """
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[Callable[..., None], tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, write: Callable[..., None], *args: Any) -> None:
+        """Queue write(*args) to run on the writer thread, starting the thread on first use."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((write, args))
+
+    def flush(self) -> None:
+        """Block until every submitted write has finished."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            write, args = self._queue.get()
+            try:
+                write(*args)
+            except Exception as e:
+                logger.error(f"Background write failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+# Shared writer used by the save_* helpers below
+snapshot_writer = SnapshotWriter()
+
+def _detach(data: Any) -> Any:
+    """
+    Copy the containers of a state (update) two levels deep before handing it to the writer thread.
+    Nodes may keep mutating dicts like generated_code in place; their leaves are immutable strings.
+    """
+    if isinstance(data, dict):
+        return {key: _detach_container(value) for key, value in data.items()}
+    return _detach_container(data)
+
+def _detach_container(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: (item.copy() if isinstance(item, (dict, list, set)) else item) for key, item in value.items()}
+    if isinstance(value, (list, set)):
+        return value.copy()
+    return value
+
 def save_state_snapshot(state: Dict[str, Any], run_folder: str, step_name: str) -> None:
-    """Save a snapshot of the current state after a step execution"""
+    """
+    Save a snapshot of the state after a step execution. The first snapshot of a run is written
+    in full to NNNN_{step_name}_state.json; later ones only hold what changed since the previous
+    snapshot, in NNNN_{step_name}_state.patch.json, so each step costs its own changes rather than
+    the whole (growing) state. NNNN numbers the run's snapshots in order; replay_state() applies
+    them. Written in the background by snapshot_writer.
+    """
+    # A node that returns a Command without an update streams as {node: None}
+    if not isinstance(state, dict):
+        logger.debug(f"No state update to snapshot after step {step_name}")
+        return
+    
     try:
-        # Create a JSON-serializable version of the state
-        serializable_state = prepare_state_for_serialization(state)
+        previous = _last_snapshots.get(run_folder)
+        if previous is None:
+            _last_snapshots[run_folder] = previous = {}
+            _snapshot_patch(state, previous)
+            payload, suffix = state, "state.json"
+        else:
+            payload, suffix = _snapshot_patch(state, previous), "state.patch.json"
+            if not payload:
+                logger.debug(f"No state changes after step {step_name}")
+                return
         
-        # Save to a JSON file
-        filename = os.path.join(run_folder, f"{step_name}_state.json")
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(serializable_state, f, indent=2, ensure_ascii=False)
+        filename = os.path.join(run_folder, f"{_next_file_number(run_folder, 'state'):04d}_{step_name}_{suffix}")
+        snapshot_writer.submit(_write_state_snapshot, _detach(payload), filename, step_name)
+    except Exception as e:
+        logger.error(f"Failed to save state snapshot: {str(e)}")
+
+def _write_state_snapshot(payload: Dict[str, Any], filename: str, step_name: str) -> None:
+    """Serialize and write a state snapshot or patch; runs on the writer thread."""
+    try:
+        # Compact JSON in a single write; these files are written on every step
+        with open(filename, "wb") as f:
+            f.write(json_utils.dumps(prepare_state_for_serialization(payload)))
         
         logger.debug(f"Saved state snapshot after step {step_name}")
     except Exception as e:
         logger.error(f"Failed to save state snapshot: {str(e)}")
 
+def _snapshot_patch(state: Dict[str, Any], previous: Dict[Tuple[str, ...], Any]) -> Dict[str, Any]:
+    """
+    Return the keys of state whose value is not the object snapshotted last time, recording the new ones.
+    Merged dicts (generated_code, review_status, ...) only carry their changed entries, matching how
+    the graph applies them; every other key is replaced whole. Values are compared by identity, so
+    nothing is encoded here; an equal but new object is simply written again.
+    """
+    patch = {}
+    for key, value in state.items():
+        if key in _MERGED_KEYS and isinstance(value, dict):
+            changed = {}
+            for entry_key, entry in value.items():
+                if previous.get((key, entry_key), _UNSET) is not entry:
+                    previous[(key, entry_key)] = entry
+                    changed[entry_key] = entry
+            if changed:
+                patch[key] = changed
+        elif previous.get((key,), _UNSET) is not value:
+            previous[(key,)] = value
+            patch[key] = value
+    return patch
+
+_UNSET = object()
+
+def replay_state(run_folder: str) -> Dict[str, Any]:
+    """
+    Rebuild the latest snapshotted state of a run: the full first snapshot with every later patch
+    applied in order, merging the entries of merged dicts like the graph does.
+    """
+    state: Dict[str, Any] = {}
+    snapshots = sorted(
+        name for name in os.listdir(run_folder)
+        if name[:4].isdigit() and name.endswith(("_state.json", "_state.patch.json"))
+    )
+    for name in snapshots:
+        with open(os.path.join(run_folder, name), "rb") as f:
+            patch = json_utils.loads(f.read())
+        for key, value in patch.items():
+            if key in _MERGED_KEYS and isinstance(value, dict) and isinstance(state.get(key), dict):
+                state[key] = {**state[key], **value}
+            else:
+                state[key] = value
+    return state
+
 def prepare_state_for_serialization(state: Dict[str, Any]) -> Dict[str, Any]:
     """Convert state to a JSON-serializable format"""
     serializable = {}
@@ -45,76 +199,108 @@ def prepare_state_for_serialization(state: Dict[str, Any]) -> Dict[str, Any]:
         if key in ["_graph_runner"]:
             continue
             
-        try:
-            # Test JSON serializability
-            json.dumps(value)
+        if isinstance(value, (set, frozenset)):
+            serializable[key] = sorted(value, key=str)
+            continue
+        
+        if _is_json_safe(value):
             serializable[key] = value
-        except (TypeError, OverflowError):
-            # If not JSON serializable, convert to string representation
-            if isinstance(value, dict):
-                # Recursively process dictionaries
-                serializable[key] = prepare_state_for_serialization(value)
-            else:
-                # Convert other non-serializable objects to string
-                serializable[key] = str(value)
+        elif isinstance(value, dict):
+            # Recursively process dictionaries
+            serializable[key] = prepare_state_for_serialization(value)
+        else:
+            # Convert other non-serializable objects to string
+            serializable[key] = str(value)
     
     return serializable
 
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+def _is_json_safe(value: Any) -> bool:
+    """
+    Check structurally that json.dumps would accept value, without encoding it. Strings are
+    leaves, so a dict of generated code costs one isinstance check per file rather than
+    encoding every file's text.
+    """
+    if isinstance(value, _JSON_SCALARS):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_json_safe(item) for item in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, _JSON_SCALARS) and _is_json_safe(item) for key, item in value.items())
+    return False
+
 def initialize_overview(run_folder: str) -> None:
-    """Initialize the overview.json file if it doesn't exist"""
-    overview_path = os.path.join(run_folder, "overview.json")
-    if not os.path.exists(overview_path):
-        with open(overview_path, "w", encoding="utf-8") as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
-        logger.debug(f"Initialized overview.json in {run_folder}")
-
-def append_to_overview(run_folder: str, node_name: str, inputs: Any, outputs: Any) -> None:
-    """Append a new step entry to the overview.json file"""
+    """Open the run's overview.jsonl (one step entry per line) for appending, once per run folder"""
+    if run_folder in _overview_files:
+        return
+    overview_path = os.path.join(run_folder, "overview.jsonl")
+    steps = 0
+    if os.path.exists(overview_path):
+        with open(overview_path, "rb") as f:
+            steps = sum(1 for _ in f)
+    _overview_files[run_folder] = open(overview_path, "ab", buffering=65536)
+    _overview_steps[run_folder] = steps
+    logger.debug(f"Initialized overview.jsonl in {run_folder}")
+
+def append_to_overview(run_folder: str, node_name: str, inputs: Any, outputs: Any,
+                       timestamp: Optional[datetime.datetime] = None) -> None:
+    """Append a new step entry to the overview.jsonl file"""
     try:
-        overview_path = os.path.join(run_folder, "overview.json")
-        
-        # Initialize if not exists
-        if not os.path.exists(overview_path):
-            initialize_overview(run_folder)
-        
-        # Read current overview
-        with open(overview_path, "r", encoding="utf-8") as f:
-            overview_data = json.load(f)
+        initialize_overview(run_folder)
+        _overview_steps[run_folder] += 1
         
         # Create a simplified entry
-        timestamp = datetime.datetime.now().isoformat()
         entry = {
-            "step": len(overview_data) + 1,
-            "timestamp": timestamp,
+            "step": _overview_steps[run_folder],
+            "timestamp": (timestamp or datetime.datetime.now()).isoformat(),
             "node": node_name,
             "input_summary": summarize_data(inputs),
             "output_summary": summarize_data(outputs)
         }
         
-        # Append the new entry
-        overview_data.append(entry)
+        _overview_files[run_folder].write(json_utils.dumps(entry) + b"\n")
+        logger.debug(f"Appended step {entry['step']} to overview.jsonl")
+    except Exception as e:
+        logger.error(f"Failed to update overview.jsonl: {str(e)}")
+
+def finalize_overview(run_folder: str) -> None:
+    """Close the run's overview.jsonl and convert it into the overview.json array"""
+    try:
+        overview_file = _overview_files.pop(run_folder, None)
+        _overview_steps.pop(run_folder, None)
+        if overview_file is not None:
+            overview_file.close()
         
-        # Write back to file
-        with open(overview_path, "w", encoding="utf-8") as f:
-            json.dump(overview_data, f, indent=2, ensure_ascii=False)
-            
-        logger.debug(f"Updated overview.json with step {entry['step']}")
+        overview_path = os.path.join(run_folder, "overview.jsonl")
+        if not os.path.exists(overview_path):
+            return
+        with open(overview_path, "rb") as f:
+            overview_data = [json_utils.loads(line) for line in f if line.strip()]
+        with open(os.path.join(run_folder, "overview.json"), "wb") as f:
+            f.write(json_utils.dumps(overview_data, pretty=True))
     except Exception as e:
-        logger.error(f"Failed to update overview.json: {str(e)}")
+        logger.error(f"Failed to finalize overview.json: {str(e)}")
+
+# At most this many keys of a dict are summarized in an overview entry
+_SUMMARY_MAX_KEYS = 20
 
 def summarize_data(data: Any) -> Any:
-    """Create a simplified summary of complex data structures"""
+    """Create a simplified, one-level summary of complex data structures"""
     if isinstance(data, dict):
         summary = {}
         for key, value in data.items():
             # Skip special keys
             if key.startswith("_"):
                 continue
+            if len(summary) == _SUMMARY_MAX_KEYS:
+                summary["<...>"] = f"<dict with {len(data)} items>"
+                break
                 
-            # Summarize based on type
+            # Summarize based on type; nested containers are never walked
             if isinstance(value, dict):
                 summary[key] = f"<dict with {len(value)} items>"
-            elif isinstance(value, (list, tuple)):
+            elif isinstance(value, (list, tuple, set, frozenset)):
                 summary[key] = f"<{type(value).__name__} with {len(value)} items>"
             elif isinstance(value, str) and len(value) > 100:
                 summary[key] = f"{value[:97]}..."
@@ -129,36 +315,82 @@ def summarize_data(data: Any) -> Any:
         return data
 
 def save_node_io(run_folder: str, node_name: str, inputs: Any, outputs: Any) -> None:
-    """Save the inputs and outputs of a node execution"""
+    """Save the inputs and outputs of a node execution (written in the background)"""
+    snapshot_writer.submit(_write_node_io, run_folder, node_name, _detach(inputs), _detach(outputs))
+
+def _write_node_io(run_folder: str, node_name: str, inputs: Any, outputs: Any) -> None:
     try:
         node_dir = os.path.join(run_folder, "node_io", node_name)
         os.makedirs(node_dir, exist_ok=True)
         
-        # Save inputs
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Number the files by step: two steps within the same second used to overwrite each other
+        prefix = f"{_next_file_number(run_folder, 'node_io'):05d}"
+        timestamp = datetime.datetime.now()
         
-        with open(os.path.join(node_dir, f"{timestamp}_input.json"), "w", encoding="utf-8") as f:
-            json.dump(prepare_state_for_serialization(inputs), f, indent=2, ensure_ascii=False)
+        # Save inputs
+        with open(os.path.join(node_dir, f"{prefix}_input.json"), "wb") as f:
+            f.write(json_utils.dumps(_store_code_blobs(prepare_state_for_serialization(inputs), run_folder)))
             
         # Save outputs
-        with open(os.path.join(node_dir, f"{timestamp}_output.json"), "w", encoding="utf-8") as f:
-            json.dump(prepare_state_for_serialization(outputs), f, indent=2, ensure_ascii=False)
+        with open(os.path.join(node_dir, f"{prefix}_output.json"), "wb") as f:
+            f.write(json_utils.dumps(_store_code_blobs(prepare_state_for_serialization(outputs), run_folder)))
         
         # Update the overview.json file with this step
-        append_to_overview(run_folder, node_name, inputs, outputs)
+        append_to_overview(run_folder, node_name, inputs, outputs, timestamp)
             
         logger.debug(f"Saved I/O for node {node_name}")
     except Exception as e:
         logger.error(f"Failed to save node I/O: {str(e)}")
 
+def _store_code_blobs(state: Dict[str, Any], run_folder: str) -> Dict[str, Any]:
+    """
+    Replace each generated_code entry with a {"$blob": hash, "size": chars} reference, writing the
+    code itself to blobs/<hash>.gd the first time it is seen, so node I/O files don't repeat every
+    file already generated. load_state() puts the code back.
+    """
+    generated_code = state.get("generated_code")
+    if not isinstance(generated_code, dict):
+        return state
+    
+    written = _written_blobs.setdefault(run_folder, set())
+    references = {}
+    for filename, code in generated_code.items():
+        if not isinstance(code, str):
+            references[filename] = code
+            continue
+        digest = hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
+        if digest not in written:
+            blob_dir = os.path.join(run_folder, "blobs")
+            os.makedirs(blob_dir, exist_ok=True)
+            with open(os.path.join(blob_dir, f"{digest}.gd"), "w", encoding="utf-8") as f:
+                f.write(code)
+            written.add(digest)
+        references[filename] = {"$blob": digest, "size": len(code)}
+    return {**state, "generated_code": references}
+
+def load_state(run_folder: str, filename: str) -> Dict[str, Any]:
+    """Load a saved state or node I/O file (path relative to run_folder), inlining generated code stored as blobs"""
+    with open(os.path.join(run_folder, filename), "rb") as f:
+        state = json_utils.loads(f.read())
+    
+    generated_code = state.get("generated_code")
+    if isinstance(generated_code, dict):
+        for key, value in generated_code.items():
+            if isinstance(value, dict) and "$blob" in value:
+                with open(os.path.join(run_folder, "blobs", f"{value['$blob']}.gd"), "r", encoding="utf-8") as blob:
+                    generated_code[key] = blob.read()
+    return state
+
 def save_final_state(state: Dict[str, Any], run_folder: str, status: str = "complete") -> None:
-    """Save the final state of the run"""
+    """Save the final state of the run, once every pending snapshot has been written"""
+    snapshot_writer.submit(finalize_overview, run_folder)
+    snapshot_writer.flush()
     try:
         # Save the complete final state
         serializable_state = prepare_state_for_serialization(state)
         
-        with open(os.path.join(run_folder, f"final_state_{status}.json"), "w", encoding="utf-8") as f:
-            json.dump(serializable_state, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(run_folder, f"final_state_{status}.json"), "wb") as f:
+            f.write(json_utils.dumps(serializable_state, pretty=True))
         
         # Save a run summary with key information
         summary = {
@@ -16,7 +16,7 @@ class SceneSetupNode:
     """
     def __init__(self, name: str):
         self.name = name
-        logger.info(f"SceneSetupNode initialized: {name}")
+        logger.info("SceneSetupNode initialized: %s", name)
         
     def __call__(self, state: GodotState):
         """Make node callable for LangGraph"""
@@ -35,35 +35,21 @@ class SceneSetupNode:
             
         # Create a prompt for scene setup based on the generated code
         file_list = "\n".join([f"- {filename}" for filename in generated_code.keys()])
-        
-        prompt = PROMPTS.get("scene_setup", "").format(
+        prompt = PROMPTS["scene_setup"].format(
             file_list=file_list,
-            game_premise=instructions.get("game_premise", ""),
             code_samples="\n\n".join([f"// {filename}:\n{code[:300]}..." for filename, code in generated_code.items()])
         )
         
-        # If no scene setup prompt template exists, create a basic one
-        if not prompt:
-            prompt = f"""
-You are a Godot engine expert helping to set up scenes for a new game.
-Based on these generated GDScript files, provide step-by-step instructions for creating scenes.
-
-Game Premise: {instructions.get("game_premise", "")}
-
-Files:
-{file_list}
-
-Code samples:
-{"\n\n".join([f"// {filename}:\n{code[:300]}..." for filename, code in generated_code.items()])}
-
-Please provide clear, numbered steps for setting up the main scenes needed for this game prototype.
-Include node hierarchy, script attachments, and any necessary configurations.
-"""
+        # The premise and instructions are static system blocks, cached like the planner's and code writer's
+        system = [
+            PROMPTS["game_premise_system"].format(game_premise=instructions.get("game_premise", "")),
+            PROMPTS["scene_setup_system"]
+        ]
         
         # Call Claude to generate scene setup instructions
-        scene_guide = call_claude(prompt)
+        scene_guide = call_claude(prompt, system=system)
         
-        logger.info(f"Generated scene setup guide ({len(scene_guide)} chars)")
+        logger.info("Generated scene setup guide (%s chars)", len(scene_guide))
         
         return Command(
             goto="final_report",
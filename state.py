@@ -10,14 +10,15 @@ def last_value_reducer(current_val, new_val):
     return new_val
 
 def dict_merge_reducer(current_dict, new_dict):
-    """Reducer that merges dictionary values."""
+    """
+    Reducer that merges dictionary values. The result is a new dict (states handed to nodes
+    and snapshots must not change under them); empty updates return the current dict as is.
+    """
     if current_dict is None:
         return new_dict
-    if new_dict is None:
+    if not new_dict:
         return current_dict
-    result = current_dict.copy()
-    result.update(new_dict)
-    return result
+    return current_dict | new_dict
 
 def list_extend_reducer(current_list, new_list):
     """Reducer that extends lists."""
@@ -35,12 +36,18 @@ class GodotState(TypedDict, total=False):
     # Current file being processed - using last_value_reducer for handling concurrent updates
     current_file: Annotated[Optional[Dict[str, Any]], last_value_reducer]
     
-    # Files waiting to be processed - use list extension for concurrent additions
-    pending_files: Annotated[List[Dict[str, Any]], list_extend_reducer]
+    # Files waiting to be processed - the file processor owns the queue and always writes it back whole
+    pending_files: Annotated[List[Dict[str, Any]], last_value_reducer]
+    
+    # Set by the file processor when pending_files has been deduplicated and filtered; any other writer clears it
+    pending_files_clean: Annotated[bool, last_value_reducer]
     
     # Collection of generated code - merge dictionaries for concurrent updates
     generated_code: Annotated[Dict[str, str], dict_merge_reducer]
     
+    # First-iteration drafts written ahead of the writer/review loop - merge for concurrent drafting
+    drafts: Annotated[Dict[str, str], dict_merge_reducer]
+    
     # Status of file reviews - merge dictionaries for concurrent reviews
     review_status: Annotated[Dict[str, str], dict_merge_reducer]
     
@@ -50,11 +57,20 @@ class GodotState(TypedDict, total=False):
     # Scene setup guides
     scene_guide: Annotated[str, last_value_reducer]
     
-    # Report
+    # Report - kept in state only when there is no run folder to write it to
     final_report: Annotated[str, last_value_reducer]
     
+    # Where the final report was written
+    final_report_path: Annotated[str, last_value_reducer]
+    
+    # Output folder for this run (see run_utils.create_run_folder)
+    run_folder: str
+    
     # Log messages - extend list for multiple log entries
     messages: Annotated[List[str], list_extend_reducer]
     
     # Track processed files
     processed_files: Union[List[str], Set[str]]
+    
+    # Generated files whose dependencies have already been analyzed
+    analyzed_files: Set[str]
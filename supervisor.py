@@ -1,15 +1,20 @@
 import logging
 from typing import Dict, Any, List, Literal
-import re
-import json
 from langgraph.types import Command
 
-from claude_api import call_claude
+from claude_api import call_claude_tool
 from state import GodotState
-from config import PROMPTS
+from config import PROMPTS, FILE_PLANNING_TOOL, PLAN_WITH_DRAFTS, CLAUDE_MAX_TOKENS, DRAFT_MULTI_FILE_MAX_TOKENS
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on the files planned up front, to prevent the plan from exploding
+MAX_INITIAL_FILES = 25
+
+def _empty_results() -> Dict[str, Any]:
+    """Fresh, empty result containers for a new round of generation (new objects every time; nodes may mutate them)."""
+    return {"generated_code": {}, "review_status": {}, "detailed_reviews": {}, "processed_files": []}
+
 class SupervisorNode:
     """
     Manages the entire code generation workflow with iterative refinement.
@@ -18,150 +23,119 @@ class SupervisorNode:
     def __init__(self, name: str, max_iterations: int = 3):
         self.name = name  # Just store the name directly, no super() call needed
         self.max_iterations = max_iterations
-        logger.info(f"SupervisorNode initialized with max_iterations={max_iterations}")
+        logger.info("SupervisorNode initialized with max_iterations=%s", max_iterations)
         
     def __call__(self, state: GodotState):
         """Make node callable for LangGraph"""
         return self.invoke(state)
 
-    def invoke(self, state: GodotState) -> Command[Literal["code_writer", "scene_setup"]]:
+    def invoke(self, state: GodotState) -> Command[Literal["file_processor", "scene_setup"]]:
         instructions = state.get("instructions")
         if not instructions:
             msg = "No instructions found for SupervisorNode."
             logger.error(msg)
             raise ValueError(msg)
 
+        # If we already have generated code, we're in a subsequent iteration; its plan would be discarded
+        generated_code = state.get("generated_code")
+        if generated_code:
+            # We have some code already, send to scene setup
+            logger.info("Code generation complete with %s files", len(generated_code))
+            return Command(goto="scene_setup")
+        
         # Dynamically plan files to generate based on game premise
         game_premise = instructions.get("game_premise", "")
-        logger.info(f"Planning necessary files based on game premise: {game_premise[:50]}...")
+        logger.info("Planning necessary files based on game premise: %s...", game_premise[:50])
         files_to_generate = self._plan_necessary_files(game_premise, instructions)
-        logger.info(f"Initial plan: {len(files_to_generate)} files to generate")
+        logger.info("Initial plan: %s files to generate", len(files_to_generate))
         
-        # If we already have generated code, we're in a subsequent iteration
-        if state.get("generated_code"):
-            # We have some code already, send to scene setup
-            logger.info(f"Code generation complete with {len(state['generated_code'])} files")
-            return Command(goto="scene_setup")
-        
-        # First file to process - ensure we have valid files with filenames
+        # _plan_necessary_files has already dropped invalid entries
         if files_to_generate:
-            validated_files = []
-            for file_def in files_to_generate:
-                if not file_def.get("filename"):
-                    logger.error(f"Skipping file with missing filename: {file_def}")
-                    continue
-                if file_def.get("filename") == "Unnamed.gd":
-                    logger.error(f"Skipping unnamed file in initial plan: {file_def}")
-                    continue
-                validated_files.append(file_def)
-                
-            if len(validated_files) < len(files_to_generate):
-                logger.warning(f"Filtered out {len(files_to_generate) - len(validated_files)} invalid files from initial plan")
-                
-            files_to_generate = validated_files
+            logger.info("Starting code generation with %s file(s)", len(files_to_generate))
             
-            if files_to_generate:
-                first_file = files_to_generate[0]
-                logger.info(f"Starting code generation with file: {first_file['filename']}")
-                
-                # Set current file and file list for the code writer node
-                return Command(
-                    update={
-                        "current_file": first_file,
-                        "pending_files": files_to_generate[1:],
-                        "generated_code": {},
-                        "review_status": {},
-                        "detailed_reviews": {},
-                        "processed_files": []
-                    },
-                    goto="code_writer"
-                )
-            else:
-                logger.warning("No valid files to generate after filtering!")
-                # No valid files to generate
-                return Command(
-                    update={
-                        "generated_code": {},
-                        "review_status": {},
-                        "detailed_reviews": {},
-                        "processed_files": []
-                    },
-                    goto="scene_setup"
-                )
-        else:
-            # No files to generate
-            logger.warning("No files to generate!")
+            # Queue every file; the file processor fans them out to parallel writer/review branches
             return Command(
                 update={
-                    "generated_code": {},
-                    "review_status": {},
-                    "detailed_reviews": {},
-                    "processed_files": []
+                    **_empty_results(),
+                    "pending_files": files_to_generate,
+                    "pending_files_clean": False,
+                    "drafts": self._take_drafts(files_to_generate)
                 },
-                goto="scene_setup"
+                goto="file_processor"
             )
+        
+        # No files to generate
+        logger.warning("No files to generate!")
+        return Command(update=_empty_results(), goto="scene_setup")
 
     
     def _plan_necessary_files(self, game_premise: str, instructions: Dict[str, Any]) -> List[Dict[str, Any]]:
       """Dynamically determine which files to generate based on game premise."""
       logger.info("Creating dynamic file plan for game")
       
-      logger.info(PROMPTS["file_planning"])
+      logger.debug("File planning instructions:%s", PROMPTS["file_planning_system"])
 
-      # Build a prompt to ask Claude about necessary files
-      prompt = PROMPTS["file_planning"].format(game_premise=game_premise)
+      # The premise goes in the same leading system block the code writer uses, so it is cached once
+      system = [
+          PROMPTS["game_premise_system"].format(game_premise=game_premise),
+          PROMPTS["file_planning_system"]
+      ]
 
-      # Call Claude to get file planning
-      response = call_claude(prompt)
+      # Call Claude to get file planning; it must answer through the plan_files tool, so the plan arrives
+      # as parsed JSON. With PLAN_WITH_DRAFTS the same call also drafts every file, so it gets the larger
+      # multi-file output budget.
+      plan = None
+      if PLAN_WITH_DRAFTS:
+          plan = call_claude_tool(PROMPTS["file_planning_with_drafts"], FILE_PLANNING_TOOL,
+                                  max_tokens=DRAFT_MULTI_FILE_MAX_TOKENS, system=system)
+          if not plan:
+              # Usually the drafts outgrew the output budget; losing them is fine, losing the plan is not
+              logger.warning("Planning with drafts failed; planning without drafts instead")
+      if not plan:
+          plan = call_claude_tool(PROMPTS["file_planning"], FILE_PLANNING_TOOL, max_tokens=CLAUDE_MAX_TOKENS, system=system)
 
-      # DEBUG: Log full response
-      logger.info(f"Raw Claude response:\n{response}")
+      # The full plan only goes to the log at DEBUG level (formatted lazily)
+      logger.debug("Planned files from Claude:\n%s", plan)
 
-      # Extract JSON from response
-      json_match = re.search(r'\[[\s\S]*\]', response)
-      if not json_match:
-          msg = "Failed to extract valid JSON from Claude's file planning response"
+      planned_files = plan.get("files") if plan else None
+      if not isinstance(planned_files, list):
+          msg = "Claude's file planning call did not return a list of files"
           logger.error(msg)
           raise ValueError(msg)
 
-      json_text = json_match.group(0)
-
-      # DEBUG: Log extracted JSON
-      logger.info(f"Extracted JSON:\n{json_text}")
-
-      try:
-          planned_files = json.loads(json_text)
-          
-          # Validate the planned files to ensure they have filenames
-          valid_files = []
-          for file in planned_files:
-              if not isinstance(file, dict):
-                  logger.error(f"Skipping non-dict file entry: {file}")
-                  continue
-                  
-              if not file.get("filename"):
-                  logger.error(f"File is missing filename: {file}")
-                  continue
-                  
-              if file.get("filename") == "Unnamed.gd":
-                  logger.error(f"Found unnamed file in plan: {file}")
-                  continue
-                  
-              valid_files.append(file)
-          
-          if len(valid_files) < len(planned_files):
-              logger.warning(f"Filtered out {len(planned_files) - len(valid_files)} invalid files from plan")
-          
-          # Limit the number of initial files to prevent explosion
-          MAX_INITIAL_FILES = 25
-          if len(valid_files) > MAX_INITIAL_FILES:
-              logger.warning(f"Too many initial files ({len(valid_files)}), limiting to {MAX_INITIAL_FILES}")
-              valid_files = valid_files[:MAX_INITIAL_FILES]
-          
-          logger.info(f"Successfully planned {len(valid_files)} files with Claude")
-          return valid_files
-          
-      except json.JSONDecodeError as e:
-          logger.error(f"JSON decoding error: {e}")
-          raise
+      logger.info("Claude planned %s file entries", len(planned_files))
+      
+      valid_files = self._validate_files(planned_files)
+      logger.info("Successfully planned %s files with Claude", len(valid_files))
+      return valid_files
+
+    @staticmethod
+    def _validate_files(planned_files: List[Any]) -> List[Dict[str, Any]]:
+        """Keep the planned entries that are dicts with a real filename, up to MAX_INITIAL_FILES."""
+        valid_files = []
+        for file in planned_files:
+            filename = file.get("filename") if isinstance(file, dict) else None
+            if not filename or filename == "Unnamed.gd":
+                logger.error("Skipping invalid file entry in plan: %s", file)
+                continue
+            valid_files.append(file)
+        
+        if len(valid_files) < len(planned_files):
+            logger.warning("Filtered out %s invalid files from plan", len(planned_files) - len(valid_files))
+        
+        if len(valid_files) > MAX_INITIAL_FILES:
+            logger.warning("Too many initial files (%s), limiting to %s", len(valid_files), MAX_INITIAL_FILES)
+            valid_files = valid_files[:MAX_INITIAL_FILES]
+        return valid_files
 
+    @staticmethod
+    def _take_drafts(files: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Move any initial_code the planner wrote out of the file definitions and into drafts."""
+        drafts = {}
+        for file_def in files:
+            initial_code = file_def.pop("initial_code", None)
+            if isinstance(initial_code, str) and initial_code.strip():
+                drafts[file_def["filename"]] = initial_code
+        if drafts:
+            logger.info("Planner drafted %s of %s files", len(drafts), len(files))
+        return drafts
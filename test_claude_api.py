@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+
+import claude_api
+from llm_cache import LLMCache
+
+class FakeStream:
+    """Stands in for the SDK's MessageStream: yields text chunks, then reports a stop_reason."""
+    def __init__(self, chunks, stop_reason):
+        self.text_stream = iter(chunks)
+        self.current_message_snapshot = SimpleNamespace(stop_reason=stop_reason)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeMessages:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def stream(self, **request):
+        self.requests.append(request)
+        return FakeStream(*self.responses.pop(0))
+
+    def create(self, **request):
+        self.requests.append(request)
+        tool_input, stop_reason = self.responses.pop(0)
+        return SimpleNamespace(content=[SimpleNamespace(type="tool_use", input=tool_input)], stop_reason=stop_reason,
+                               usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+
+@pytest.fixture
+def fake_client(monkeypatch, tmp_path):
+    def install(*responses):
+        messages = FakeMessages(responses)
+        monkeypatch.setattr(claude_api, "get_client", lambda: SimpleNamespace(messages=messages))
+        monkeypatch.setenv("CLAUDE_CACHE", "on")
+        monkeypatch.setattr(claude_api, "llm_cache", LLMCache(directory=str(tmp_path)))
+        return messages
+    return install
+
+def test_stream_cut_off_at_max_tokens_is_retried_with_the_larger_budget(fake_client):
+    messages = fake_client(
+        (["```gdscript\nextends Control\n"], "max_tokens"),
+        (["```gdscript\nextends Control\nfunc _ready() -> void:\n\tpass\n```"], "end_turn"),
+    )
+    response = claude_api.call_claude_stream("ui", max_tokens=2500, retry_max_tokens=8192)
+    assert response.endswith("```")
+    assert [request["max_tokens"] for request in messages.requests] == [2500, 8192]
+
+def test_stream_cut_off_without_a_retry_budget_is_not_cached(fake_client):
+    fake_client(
+        (["partial"], "max_tokens"),
+        (["complete"], "end_turn"),
+    )
+    assert claude_api.call_claude_stream("prompt", max_tokens=100) == "partial"
+    assert claude_api.call_claude_stream("prompt", max_tokens=100) == "complete"
+
+def test_stream_stopped_early_by_until_is_not_a_cut_off(fake_client):
+    messages = fake_client((["```gdscript\n", "pass\n```", "trailing prose"], "max_tokens"))
+    response = claude_api.call_claude_stream("prompt", max_tokens=100, until=lambda chunk: "```" in chunk and "pass" in chunk,
+                                             retry_max_tokens=8192)
+    assert response == "```gdscript\npass\n```"
+    assert len(messages.requests) == 1
+
+PLAN_TOOL = {"name": "plan_files", "input_schema": {"type": "object"}}
+
+def test_tool_call_returns_the_forced_tool_input_and_caches_it(fake_client):
+    messages = fake_client(({"files": [{"filename": "A.gd", "purpose": "a"}]}, "tool_use"))
+    for _ in range(2):
+        assert claude_api.call_claude_tool("plan", PLAN_TOOL) == {"files": [{"filename": "A.gd", "purpose": "a"}]}
+    assert len(messages.requests) == 1
+    assert messages.requests[0]["tool_choice"] == {"type": "tool", "name": "plan_files"}
+
+def test_tool_call_cut_off_at_max_tokens_returns_none(fake_client):
+    fake_client(({"files": [{"filename": "A.gd"}]}, "max_tokens"))
+    assert claude_api.call_claude_tool("plan", PLAN_TOOL) is None
@@ -0,0 +1,40 @@
+from code_review import CodeReviewNode, _comment_start, _split_params
+
+def _issues(code: str, filename: str = "Helper.gd"):
+    return CodeReviewNode("CodeReviewer")._validate_gdscript(code, filename)
+
+def _script(*body: str) -> str:
+    return "\n".join(("extends Node", "class_name Helper", *body))
+
+def test_default_values_with_commas_are_one_parameter():
+    code = _script("func foo(a: Vector2 = Vector2(1, 2), b: int = 3) -> void:", "\tpass")
+    assert not any("parameters without type hints" in issue for issue in _issues(code))
+
+def test_untyped_parameters_are_reported():
+    code = _script('func foo(a, b: int, c = Vector2(1, 2), d := "x,y") -> void:', "\tpass")
+    assert "Function parameters without type hints: a, c = Vector2(1, 2)" in _issues(code)
+
+def test_split_params_stops_at_the_closing_parenthesis():
+    line = 'func foo(a: Dictionary = {"k": [1, 2]}, b: String = "(,)") -> int:'
+    assert _split_params(line, line.index("(") + 1) == ['a: Dictionary = {"k": [1, 2]}', 'b: String = "(,)"']
+
+def test_hash_inside_strings_is_not_a_comment():
+    assert _comment_start('var s: String = "# not a comment"') == -1
+    for line in ("var s: String = '#' # tag", 'var s: String = "\\"#" # tag'):
+        assert _comment_start(line) == line.index("# tag")
+
+def test_comment_count_ignores_hashes_in_strings():
+    body = ['var s%d: String = "# not a comment"' % i for i in range(12)]
+    code = _script(*body)
+    assert "Only 0 comment(s); expected at least 3" in _issues(code)
+
+def test_a_script_that_follows_every_rule_has_no_issues():
+    code = _script("# Emitted when the value changes", "signal changed(value: int)",
+                   "var value: int = 0  # Current value", "", "# Set up the node",
+                   "func _ready() -> void:", "\tvalue = 1")
+    assert _issues(code) == []
+
+def test_missing_extends_and_untyped_variables_are_reported():
+    issues = _issues("class_name Helper\nvar speed = 10\nvar name := \"x\"")
+    assert "Missing 'extends' statement" in issues
+    assert "Variables without type hints: speed" in issues
@@ -0,0 +1,60 @@
+import pytest
+
+from config import MAX_CONCURRENT_CLAUDE_CALLS
+from file_processor import FileProcessorNode, _compile_prompt, _truncate_for_analysis
+
+def test_short_code_is_not_truncated():
+    code = "extends Node\nfunc _ready() -> void:\n\tpass"
+    assert _truncate_for_analysis(code, max_tokens=100) is code
+
+def test_long_code_keeps_whole_lines_from_head_and_tail():
+    lines = [f"var line_{index:03d}: int = {index}" for index in range(200)]
+    truncated = _truncate_for_analysis("\n".join(lines), max_tokens=100)
+    kept = truncated.splitlines()
+    marker = next(line for line in kept if line.startswith("# ..."))
+    assert kept[0] == lines[0] and kept[-1] == lines[-1]
+    assert all(line in lines for line in kept if line is not marker)
+    assert marker == f"# ... ({200 - len(kept) + 1} lines omitted)"
+    assert len(truncated) - len(marker) <= 400
+
+def test_compiled_prompt_matches_str_format():
+    template = "Analyze {filename}:\n{code}\nReply with {{\"files\": []}}"
+    values = {"filename": "A.gd", "code": "extends {Node}"}
+    assert _compile_prompt(template)(**values) == template.format(**values)
+
+def test_compiled_prompt_rejects_format_specs():
+    with pytest.raises(ValueError):
+        _compile_prompt("{count:>3}")
+
+def _route(state, pending_files, new_dependencies=()):
+    generated_code = state.get("generated_code", {})
+    return FileProcessorNode("file_processor")._route(
+        state, pending_files, generated_code, set(generated_code), {}, [], list(new_dependencies))
+
+def test_one_file_goes_to_the_code_writer():
+    command = _route({}, [{"filename": "A.gd"}])
+    assert command.goto == "code_writer"
+    assert command.update["current_file"] == {"filename": "A.gd"}
+    assert command.update["pending_files"] == []
+
+def test_invalid_duplicate_and_written_files_are_dropped():
+    pending = [{"filename": "A.gd"}, {"filename": "B.gd"}, {"filename": "B.gd"}, {"filename": "Unnamed.gd"}, "C.gd"]
+    command = _route({"generated_code": {"A.gd": "extends Node"}}, pending)
+    assert command.goto == "code_writer"
+    assert command.update["current_file"] == {"filename": "B.gd"}
+
+def test_new_dependencies_are_queued():
+    command = _route({}, [], new_dependencies=[{"filename": ""}, {"filename": "C.gd"}])
+    assert command.update["current_file"] == {"filename": "C.gd"}
+
+def test_several_files_fan_out_in_waves():
+    pending = [{"filename": f"File{index}.gd"} for index in range(MAX_CONCURRENT_CLAUDE_CALLS + 2)]
+    command = _route({}, pending)
+    assert [send.node for send in command.goto] == ["file_pipeline"] * MAX_CONCURRENT_CLAUDE_CALLS
+    assert [send.arg["current_file"] for send in command.goto] == pending[:MAX_CONCURRENT_CLAUDE_CALLS]
+    assert command.update["pending_files"] == pending[MAX_CONCURRENT_CLAUDE_CALLS:]
+
+def test_an_empty_queue_moves_on_to_scene_setup():
+    command = _route({}, [])
+    assert command.goto == "scene_setup"
+    assert command.update == {"pending_files": []}
@@ -0,0 +1,21 @@
+from json_utils import extract_json_array, extract_json_object
+
+def test_bare_json_is_parsed_whole():
+    assert extract_json_array(' [{"filename": "A.gd"}] ') == [{"filename": "A.gd"}]
+    assert extract_json_object('{"files": []}') == {"files": []}
+
+def test_json_is_found_inside_prose():
+    text = 'Here are the files:\n```json\n[{"filename": "A.gd", "deps": [1, 2]}]\n```\nLet me know.'
+    assert extract_json_array(text) == [{"filename": "A.gd", "deps": [1, 2]}]
+    assert extract_json_object('Result: {"k": {"n": 1}} and {"z": 2}') == {"k": {"n": 1}}
+
+def test_brackets_in_prose_are_skipped():
+    assert extract_json_array("- [x] done\n- [todo] next\n[1, 2]") == [1, 2]
+
+def test_truncated_json_yields_none_not_an_inner_value():
+    assert extract_json_array('[{"filename": "A.gd", "deps": [1, 2]') is None
+    assert extract_json_object('{"a": {"b": 1}') is None
+
+def test_wrong_type_or_no_json_yields_none():
+    assert extract_json_object("[1, 2]") is None
+    assert extract_json_array("no json here") is None
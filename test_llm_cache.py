@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+from llm_cache import LLMCache
+
+@pytest.fixture(autouse=True)
+def cache_on(monkeypatch):
+    monkeypatch.setenv("CLAUDE_CACHE", "on")
+
+def test_responses_survive_a_new_process(tmp_path):
+    key = LLMCache.make_key(model="m", prompt="p")
+    LLMCache(directory=str(tmp_path)).set(key, "response")
+    assert LLMCache(directory=str(tmp_path)).get(key) == "response"
+    assert LLMCache(directory=str(tmp_path)).get(LLMCache.make_key(model="m", prompt="other")) is None
+
+def test_cache_off_bypasses_everything(tmp_path, monkeypatch):
+    monkeypatch.setenv("CLAUDE_CACHE", "off")
+    cache = LLMCache(directory=str(tmp_path))
+    cache.set("a" * 64, "response")
+    cache.set_batch_id("a" * 64, "msgbatch_1")
+    assert cache.get("a" * 64) is None
+    assert not os.listdir(tmp_path)
+
+def test_batch_id_is_kept_until_cleared(tmp_path):
+    key = LLMCache.make_key(requests=["a", "b"])
+    LLMCache(directory=str(tmp_path)).set_batch_id(key, "msgbatch_1")
+    resumed = LLMCache(directory=str(tmp_path))
+    assert resumed.get_batch_id(key) == "msgbatch_1"
+    resumed.clear_batch_id(key)
+    assert resumed.get_batch_id(key) is None
+
+def test_memory_keeps_the_most_recently_used_entries(tmp_path):
+    cache = LLMCache(directory=str(tmp_path), memory_entries=2)
+    cache.set("a" * 64, "a")
+    cache.set("b" * 64, "b")
+    cache.get("a" * 64)
+    cache.set("c" * 64, "c")
+    assert list(cache._memory) == ["a" * 64, "c" * 64]
+
+def test_entries_are_sharded_by_key_prefix(tmp_path):
+    key = LLMCache.make_key(prompt="p")
+    LLMCache(directory=str(tmp_path)).set(key, "response")
+    assert os.listdir(tmp_path) == [key[:2]]
+    assert os.listdir(tmp_path / key[:2]) == [f"{key}.txt"]
+
+def test_least_recently_used_files_are_evicted_past_max_mb(tmp_path):
+    cache = LLMCache(directory=str(tmp_path), max_mb=250 / (1024 * 1024))
+    keys = [character * 64 for character in "abc"]
+    for atime, key in enumerate(keys[:2], 1):
+        cache.set(key, "x" * 100)
+        os.utime(cache._path(key), (atime, time.time()))
+    cache.set(keys[2], "x" * 100)
+    assert [os.path.exists(cache._path(key)) for key in keys] == [False, True, True]
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    key = LLMCache.make_key(prompt="p")
+    cache = LLMCache(directory=str(tmp_path), ttl_days=1)
+    cache.set(key, "response")
+    written_at = time.time() - 2 * 86400
+    os.utime(cache._path(key), (written_at, written_at))
+    assert LLMCache(directory=str(tmp_path), ttl_days=1).get(key) is None
+    assert LLMCache(directory=str(tmp_path), ttl_days=0).get(key) == "response"
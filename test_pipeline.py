@@ -1,17 +1,9 @@
+import asyncio
 import logging
 import os
 from typing import Dict, Any
-from langgraph.graph import StateGraph, START, END
-from langgraph.types import Command
-
-from instruction import InstructionNode
-from code_writer import CodeWriterNode
-from code_review import CodeReviewNode
-from supervisor import SupervisorNode
-from scene_setup import SceneSetupNode
-from final_report import FinalReportNode
-from file_processor import FileProcessorNode
-from state import GodotState
+
+# Each test imports the node(s) it exercises, so running one test doesn't load every node module
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +25,8 @@ sample_instructions = {
 }
 
 def test_instruction_node():
+    from instruction import InstructionNode
+    
     logger.info("Testing InstructionNode...")
     node = InstructionNode("InstructionNode")
     state = {"instructions": {"game_premise": sample_instructions["game_premise"]}, "messages": []}
@@ -41,6 +35,8 @@ def test_instruction_node():
     return result
 
 def test_code_writer():
+    from code_writer import CodeWriterNode
+    
     logger.info("Testing CodeWriterNode...")
     node = CodeWriterNode("CodeWriter")
     state = {
@@ -56,7 +52,45 @@ def test_code_writer():
     logger.info(f"CodeWriterNode Output: {result}")
     return result
 
+def test_file_pipeline():
+    from code_writer import CodeWriterNode
+    from code_review import CodeReviewNode
+    from file_pipeline import FilePipelineNode
+    
+    logger.info("Testing FilePipelineNode...")
+    node = FilePipelineNode("FilePipeline", CodeWriterNode("CodeWriter"), CodeReviewNode("CodeReview", max_iterations=1))
+    state = {
+        "instructions": sample_instructions,
+        "current_file": {
+            "filename": "GameManager.gd",
+            "purpose": "Handles game state.",
+            "iteration": 1
+        }
+    }
+    result = node.invoke(state)
+    logger.info(f"FilePipelineNode Output: {result}")
+    return result
+
+def test_batch_code_writer():
+    from batch_code_writer import BatchCodeWriterNode
+    
+    logger.info("Testing BatchCodeWriterNode...")
+    node = BatchCodeWriterNode("BatchCodeWriter")
+    state = {
+        "instructions": sample_instructions,
+        "pending_files": [
+            {"filename": "ResourceManager.gd", "purpose": "Manages resources"},
+            {"filename": "UnitFactory.gd", "purpose": "Produces combat units"}
+        ],
+        "messages": []
+    }
+    result = node.invoke(state)
+    logger.info(f"BatchCodeWriterNode Output: {result}")
+    return result
+
 def test_code_review():
+    from code_review import CodeReviewNode
+    
     logger.info("Testing CodeReviewNode...")
     node = CodeReviewNode("CodeReviewer")
     state = {
@@ -76,6 +110,8 @@ def test_code_review():
     return result
 
 def test_supervisor():
+    from supervisor import SupervisorNode
+    
     logger.info("Testing SupervisorNode...")
     node = SupervisorNode("SupervisorNode", max_iterations=2)
     state = {"instructions": sample_instructions, "messages": []}
@@ -84,6 +120,8 @@ def test_supervisor():
     return result
 
 def test_file_processor():
+    from file_processor import FileProcessorNode
+    
     logger.info("Testing FileProcessorNode...")
     node = FileProcessorNode("FileProcessorNode")
     state = {
@@ -101,6 +139,8 @@ def test_file_processor():
     return result
 
 def test_scene_setup():
+    from scene_setup import SceneSetupNode
+    
     logger.info("Testing SceneSetupNode...")
     node = SceneSetupNode("SceneSetupNode")
     state = {
@@ -115,6 +155,8 @@ def test_scene_setup():
     return result
 
 def test_final_report():
+    from final_report import FinalReportNode
+    
     logger.info("Testing FinalReportNode...")
     node = FinalReportNode("FinalReportNode")
     state = {
@@ -129,14 +171,25 @@ def test_final_report():
     logger.info(f"FinalReportNode Output: {result}")
     return result
 
+# Every test builds its own state, so they can run side by side
+ALL_TESTS = (
+    test_instruction_node,
+    test_code_writer,
+    test_file_pipeline,
+    test_batch_code_writer,
+    test_code_review,
+    test_supervisor,
+    test_file_processor,
+    test_scene_setup,
+    test_final_report,
+)
+
+async def _run_tests_concurrently():
+    # Each test waits on Claude; run them on worker threads so the waits overlap
+    return await asyncio.gather(*(asyncio.to_thread(test) for test in ALL_TESTS))
+
 def run_all_tests():
-    test_instruction_node()
-    test_code_writer()
-    test_code_review()
-    test_supervisor()
-    test_file_processor()
-    test_scene_setup()
-    test_final_report()
+    return asyncio.run(_run_tests_concurrently())
 
 if __name__ == "__main__":
     run_all_tests()
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import TokenBucketLimiter
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake monotonic clock; sleeping advances it instead of waiting."""
+    clock = SimpleNamespace(now=0.0, slept=[])
+    def sleep(seconds):
+        clock.slept.append(seconds)
+        clock.now += seconds
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+    return clock
+
+def test_requests_wait_for_the_rpm_bucket_to_refill(clock):
+    limiter = TokenBucketLimiter(rpm=2, tpm=0)
+    assert limiter._reserve(100) == limiter._reserve(100) == 0
+    assert limiter._reserve(100) == pytest.approx(30)
+    clock.now += 30
+    assert limiter._reserve(100) == 0
+
+def test_tokens_wait_for_the_tpm_bucket_and_usage_corrects_it(clock):
+    limiter = TokenBucketLimiter(rpm=0, tpm=1000)
+    assert limiter._reserve(600) == 0
+    assert limiter._reserve(600) == pytest.approx(12)
+    limiter.record(estimated=600, actual=100)
+    assert limiter._reserve(600) == 0
+
+def test_a_request_bigger_than_the_bucket_waits_for_a_full_one(clock):
+    limiter = TokenBucketLimiter(rpm=0, tpm=1000)
+    assert limiter._reserve(5000) == 0
+    assert limiter._reserve(1) == pytest.approx(0.06)
+
+def test_acquire_sleeps_until_there_is_room(clock):
+    limiter = TokenBucketLimiter(rpm=60, tpm=0)
+    for _ in range(61):
+        limiter.acquire(1)
+    assert sum(clock.slept) == pytest.approx(1)
+
+def test_zero_limits_never_wait(clock):
+    limiter = TokenBucketLimiter(rpm=0, tpm=0)
+    for _ in range(1000):
+        limiter.acquire(10 ** 6)
+    assert not clock.slept
@@ -0,0 +1,63 @@
+import os
+
+import run_utils
+from run_utils import replay_state, save_state_snapshot, snapshot_writer
+from state import dict_merge_reducer
+
+def _apply(state, update):
+    """Fold an update into state the way the graph's reducers do."""
+    for key, value in update.items():
+        if key in run_utils._MERGED_KEYS:
+            state[key] = dict_merge_reducer(state.get(key, {}), value)
+        else:
+            state[key] = value
+
+def test_patches_replay_to_the_final_state(tmp_path):
+    run_folder = str(tmp_path)
+    review = {"feedback": "Code meets requirements.", "issues": []}
+    updates = [
+        ("initial", {"instructions": {"game_premise": "a game"}, "messages": []}),
+        ("supervisor", {"pending_files": [{"filename": "A.gd"}, {"filename": "B.gd"}]}),
+        ("code_review", {"generated_code": {"A.gd": "extends Node"}, "review_status": {"A.gd": "Approved"},
+                         "detailed_reviews": {"A.gd": review}, "current_file": {"filename": "A.gd"}}),
+        ("code_review", {"generated_code": {"B.gd": "extends Control"}, "review_status": {"B.gd": "Approved"},
+                         "current_file": {"filename": "B.gd"}}),
+        ("file_processor", {"pending_files": [], "processed_files": ["A.gd", "B.gd"]}),
+    ]
+    expected = {}
+    for step_name, update in updates:
+        save_state_snapshot(update, run_folder, step_name)
+        _apply(expected, update)
+    snapshot_writer.flush()
+
+    # Repeated steps of the same node get their own numbered file instead of overwriting each other
+    assert sorted(os.listdir(run_folder)) == [
+        "0001_initial_state.json",
+        "0002_supervisor_state.patch.json",
+        "0003_code_review_state.patch.json",
+        "0004_code_review_state.patch.json",
+        "0005_file_processor_state.patch.json",
+    ]
+    assert replay_state(run_folder) == expected
+
+def test_unchanged_entries_are_left_out_of_the_patch(tmp_path):
+    run_folder = str(tmp_path)
+    generated_code = {"A.gd": "extends Node"}
+    save_state_snapshot({"generated_code": generated_code, "current_file": {"filename": "A.gd"}}, run_folder, "first")
+    save_state_snapshot({"generated_code": {**generated_code, "B.gd": "extends Control"}, "current_file": {"filename": "A.gd"}},
+                        run_folder, "second")
+    snapshot_writer.flush()
+
+    with open(os.path.join(run_folder, "0002_second_state.patch.json"), "rb") as f:
+        patch = run_utils.json_utils.loads(f.read())
+    # An equal but new current_file is written again; the untouched A.gd entry is not
+    assert patch == {"generated_code": {"B.gd": "extends Control"}, "current_file": {"filename": "A.gd"}}
+
+def test_steps_without_an_update_are_skipped(tmp_path):
+    run_folder = str(tmp_path)
+    save_state_snapshot({"pending_files": []}, run_folder, "initial")
+    save_state_snapshot(None, run_folder, "supervisor")
+    save_state_snapshot({"pending_files": [{"filename": "A.gd"}]}, run_folder, "file_processor")
+    snapshot_writer.flush()
+    assert sorted(os.listdir(run_folder)) == ["0001_initial_state.json", "0002_file_processor_state.patch.json"]
+    assert replay_state(run_folder) == {"pending_files": [{"filename": "A.gd"}]}
@@ -0,0 +1,16 @@
+from state import dict_merge_reducer
+
+def test_merge_returns_a_new_dict_and_leaves_the_current_one_alone():
+    current = {"A.gd": "a", "B.gd": "b"}
+    merged = dict_merge_reducer(current, {"B.gd": "b2", "C.gd": "c"})
+    assert merged == {"A.gd": "a", "B.gd": "b2", "C.gd": "c"}
+    assert current == {"A.gd": "a", "B.gd": "b"}
+
+def test_empty_updates_keep_the_current_dict():
+    current = {"A.gd": "a"}
+    assert dict_merge_reducer(current, {}) is current
+    assert dict_merge_reducer(current, None) is current
+
+def test_first_update_becomes_the_value():
+    update = {"A.gd": "a"}
+    assert dict_merge_reducer(None, update) is update
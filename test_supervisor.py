@@ -0,0 +1,37 @@
+import supervisor
+from supervisor import SupervisorNode
+
+def _fake_tool(responses, prompts):
+    def call_claude_tool(prompt, tool, max_tokens=None, system=None):
+        prompts.append(prompt)
+        return responses.pop(0)
+    return call_claude_tool
+
+def test_plan_with_drafts_falls_back_to_a_plan_only_call(monkeypatch):
+    prompts = []
+    plan = {"files": [{"filename": "A.gd", "purpose": "a"}]}
+    monkeypatch.setattr(supervisor, "PLAN_WITH_DRAFTS", True)
+    monkeypatch.setattr(supervisor, "call_claude_tool", _fake_tool([None, plan], prompts))
+
+    command = SupervisorNode("SupervisorNode").invoke({"instructions": {"game_premise": "x"}})
+
+    assert prompts == [supervisor.PROMPTS["file_planning_with_drafts"], supervisor.PROMPTS["file_planning"]]
+    assert command.goto == "file_processor"
+    assert command.update["pending_files"] == [{"filename": "A.gd", "purpose": "a"}]
+    assert command.update["drafts"] == {}
+
+def test_planner_drafts_are_moved_into_drafts(monkeypatch):
+    prompts = []
+    plan = {"files": [{"filename": "A.gd", "purpose": "a", "initial_code": "extends Node\n"}, {"filename": "B.gd", "purpose": "b"}]}
+    monkeypatch.setattr(supervisor, "PLAN_WITH_DRAFTS", True)
+    monkeypatch.setattr(supervisor, "call_claude_tool", _fake_tool([plan], prompts))
+
+    command = SupervisorNode("SupervisorNode").invoke({"instructions": {"game_premise": "x"}})
+
+    assert len(prompts) == 1
+    assert command.update["drafts"] == {"A.gd": "extends Node\n"}
+    assert all("initial_code" not in file_def for file_def in command.update["pending_files"])
+
+def test_invalid_plan_entries_are_dropped():
+    files = [1, {"filename": ""}, {"filename": "Unnamed.gd"}, {"filename": "A.gd"}]
+    assert SupervisorNode._validate_files(files) == [{"filename": "A.gd"}]